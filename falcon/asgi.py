@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'falcon.settings')
+# Serve the async versions of the tracker views (see ASYNC_VIEWS in settings)
+os.environ.setdefault('FALCON_ASGI', '1')
 
 application = get_asgi_application()
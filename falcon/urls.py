@@ -16,6 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from members import views as members_views
 
 # Customize admin site headers
 admin.site.site_header = "Team Tracker Admin Portal"
@@ -24,5 +25,6 @@ admin.site.index_title = "Welcome to Team Tracker Admin Portal"
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', members_views.metrics, name='metrics'),
     path('', include('members.urls')),
 ]
@@ -1,24 +1,31 @@
 import multiprocessing
+import os
+
+# Every tunable below can be overridden from the environment (GUNICORN_*), so
+# `manage.py loadtest` can compare worker models without editing this file.
 
 # Server socket
-bind = "0.0.0.0:8000"
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# Sync workers can't afford the dashboard's live event streams; with gthread or
+# gevent set FALCON_LIVE_EVENTS=1 to turn them on (see LIVE_EVENTS_ENABLED)
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
 worker_connections = 1000
-timeout = 120
-keepalive = 2
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 2))
 
 # Restart workers after this many requests, to help prevent memory leaks
-max_requests = 1000
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
 max_requests_jitter = 50
 
 # Logging
-accesslog = "-"
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-") or None
 errorlog = "-"
-loglevel = "info"
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
 
 # Process naming
 proc_name = "falcon_django"
@@ -26,7 +33,7 @@ proc_name = "falcon_django"
 # Server mechanics
 preload_app = True
 daemon = False
-pidfile = "/tmp/gunicorn_falcon.pid"
+pidfile = os.environ.get("GUNICORN_PIDFILE", "/tmp/gunicorn_falcon.pid") or None
 user = None
 group = None
 tmp_upload_dir = None
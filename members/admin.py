@@ -1,35 +1,153 @@
 from django.contrib import admin
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+from . import search
 from .models import Member, Task
 
+
+def estimated_count(queryset):
+    """Row count of the queryset's table from planner statistics where the database keeps them.
+
+    PostgreSQL's ``reltuples`` is refreshed by (auto)vacuum and ANALYZE. Other
+    databases, and tables never analyzed, get an exact ``COUNT(*)``.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    return queryset.count()
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator for large changelists.
+
+    The unfiltered total comes from ``total`` (the admin's cheap estimate)
+    instead of ``COUNT(*)``. Filtered and searched lists are counted up to
+    ``count_cap`` rows, so a broad filter doesn't count the whole table; past
+    the cap the list is ``capped`` (templates/admin/members shows "<cap>+")
+    and open-ended: each page reads one row ahead to offer the next. Pages starting beyond
+    ``deferred_join_offset`` rows, and every page of a capped list, read just
+    the primary keys of the page through the ordering index, then fetch those
+    rows, instead of materializing every skipped row.
+    """
+    count_cap = 10000
+    deferred_join_offset = 1000
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, total=None):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.total = total
+        self.capped = False
+        self.last_page_seen = 0
+
+    @cached_property
+    def count(self):
+        if self.total is not None and not self.object_list.query.has_filters():
+            return self.total()
+        counted = self.object_list.order_by()[:self.count_cap + 1].count()
+        self.capped = counted > self.count_cap
+        return min(counted, self.count_cap)
+
+    @property
+    def open_ended(self):
+        """Whether the count stopped at ``count_cap``, counting first if need be"""
+        return self.count >= self.count_cap and self.capped
+
+    @property
+    def num_pages(self):
+        pages = super().num_pages
+        if self.open_ended:
+            # Up to the furthest page known to have rows
+            pages = max(pages, self.last_page_seen)
+        return pages
+
+    def validate_number(self, number):
+        if self.open_ended:
+            # There is no last page to check against
+            try:
+                number = int(number)
+            except (TypeError, ValueError):
+                raise PageNotAnInteger(self.error_messages['invalid_page'])
+            if number < 1:
+                raise EmptyPage(self.error_messages['min_page'])
+            return number
+        return super().validate_number(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        if not self.open_ended and bottom < self.deferred_join_offset:
+            return super().page(number)
+        if self.open_ended:
+            pks = list(self.object_list.values_list('pk', flat=True)[bottom:bottom + self.per_page + 1])
+            if not pks and number > 1:
+                raise EmptyPage(self.error_messages['no_results'])
+            self.last_page_seen = max(self.last_page_seen, number + 1 if len(pks) > self.per_page else number)
+            pks = pks[:self.per_page]
+        else:
+            top = min(bottom + self.per_page, self.count)
+            if top + self.orphans >= self.count:
+                top = self.count
+            pks = list(self.object_list.values_list('pk', flat=True)[bottom:top])
+        return self._get_page(self.object_list.filter(pk__in=pks), number, self)
+
+
+class EstimatedCountMixin:
+    """Changelists that never run a full-table ``COUNT(*)``"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page, total=lambda: self.estimated_total(queryset))
+
+    def estimated_total(self, queryset):
+        return estimated_count(queryset)
+
+
+class IndexedSearchMixin:
+    """Answer the changelist search box from the full-text index (members.search)"""
+
+    def get_search_results(self, request, queryset, search_term):
+        results = search.filter_queryset(queryset, search_term)
+        if results is None:
+            return super().get_search_results(request, queryset, search_term)
+        return results, False
+
 @admin.register(Member)
-class MemberAdmin(admin.ModelAdmin):
-    list_display = ("name", "reg_number", "email", "total_credits", "total_tasks", "created_at")
+class MemberAdmin(EstimatedCountMixin, IndexedSearchMixin, admin.ModelAdmin):
+    # The counters are stored columns, so they sort in SQL and cost no extra queries per row
+    list_display = ("name", "reg_number", "email", "total_credits", "total_tasks", "completed_tasks", "created_at")
     list_filter = ("created_at",)
     search_fields = ("name", "reg_number", "email")
-    readonly_fields = ("created_at", "updated_at")
-    
-    def total_credits(self, obj):
-        return obj.total_credits()
-    total_credits.short_description = "Total Credits"
-    
-    def total_tasks(self, obj):
-        return obj.total_tasks()
-    total_tasks.short_description = "Total Tasks"
+    readonly_fields = ("total_credits", "total_tasks", "completed_tasks", "created_at", "updated_at")
 
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(EstimatedCountMixin, IndexedSearchMixin, admin.ModelAdmin):
     list_display = ("title", "member", "credits", "is_completed", "due_date", "created_at")
     list_filter = ("is_completed", "created_at", "due_date")
     search_fields = ("title", "member__name", "member__reg_number")
-    readonly_fields = ("created_at", "updated_at")
+    readonly_fields = ("created_at", "updated_at", "completed_at")
     list_editable = ("is_completed",)
+    list_select_related = ("member",)
+    ordering = ("-created_at",)
+    # Searches the member index instead of rendering every member into a <select>
+    autocomplete_fields = ("member",)
     
     fieldsets = (
         (None, {
             'fields': ('member', 'title', 'description', 'credits', 'is_completed', 'due_date')
         }),
         ('Timestamps', {
-            'fields': ('created_at', 'updated_at'),
+            'fields': ('created_at', 'updated_at', 'completed_at'),
             'classes': ('collapse',)
         }),
     )
+
+    def estimated_total(self, queryset):
+        # Every task is counted in its member's maintained total_tasks
+        return Member.objects.using(queryset.db).aggregate(n=Coalesce(Sum('total_tasks'), 0))['n']
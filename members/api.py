@@ -0,0 +1,177 @@
+"""
+Read-only JSON API for machine clients.
+
+Every list endpoint is cursor-paginated and runs a fixed number of queries
+regardless of page size: member numbers come from the stored counters and
+tasks/leaderboard rows join their member up front.
+"""
+
+from datetime import timedelta
+
+from django.http import Http404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.utils.dateparse import parse_date
+from rest_framework import mixins, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.routers import DefaultRouter
+
+from .models import LeaderboardEntry, Member, Task, TaskEvent, TaskRollup
+from .serializers import (
+    LeaderboardEntrySerializer,
+    MemberSerializer,
+    MemberStatsSerializer,
+    TaskEventSerializer,
+    TaskRollupSerializer,
+    TaskSerializer,
+)
+
+
+class ConditionalGetMixin:
+    """Send an ETag for GET responses and answer 304 when the client already has it"""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+            return response
+        response.render()
+        set_response_etag(response)
+        return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+class TrackerCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class IdCursorPagination(TrackerCursorPagination):
+    ordering = 'id'
+
+
+class RankCursorPagination(TrackerCursorPagination):
+    ordering = ('-credits', 'member_id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super().paginate_queryset(queryset, request, view)
+        return LeaderboardEntry.objects.with_ranks(page, first_page=self.cursor is None)
+
+
+class SeqPagination(BasePagination):
+    """``?since=<seq>&limit=<n>`` paging for the event log.
+
+    Reads one row past the page to tell whether there is more, so a page is
+    a single query. Clients pass the returned ``last_seq`` back as ``since``.
+    """
+    default_limit = 500
+    max_limit = 5000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        try:
+            self.since = int(params.get('since', 0))
+            limit = min(int(params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            raise ValidationError({'since': 'since and limit must be integers.'})
+        if self.since < 0 or limit < 1:
+            raise ValidationError({'since': 'since must be >= 0 and limit >= 1.'})
+        rows = list(queryset.since(self.since)[:limit + 1])
+        self.has_more = len(rows) > limit
+        self.page = rows[:limit]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'results': data,
+            'last_seq': self.page[-1].seq if self.page else self.since,
+            'has_more': self.has_more,
+        })
+
+
+class MemberViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Member.objects.all()
+    serializer_class = MemberSerializer
+    pagination_class = IdCursorPagination
+    lookup_field = 'reg_number'
+
+    @action(detail=True)
+    def stats(self, request, reg_number=None):
+        member = self.get_object()
+        context = self.get_serializer_context()
+        context['rank'] = LeaderboardEntry.objects.rank_for_credits(member.total_credits)
+        return Response(MemberStatsSerializer(member, context=context).data)
+
+
+class TaskViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = TaskSerializer
+    pagination_class = IdCursorPagination
+
+    def get_queryset(self):
+        queryset = Task.objects.select_related('member')
+        params = self.request.query_params
+        if params.get('member'):
+            queryset = queryset.filter(member__reg_number=params['member'])
+        if params.get('completed') in ('true', 'false'):
+            queryset = queryset.filter(is_completed=params['completed'] == 'true')
+        return queryset
+
+
+class LeaderboardViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = LeaderboardEntry.objects.select_related('member')
+    serializer_class = LeaderboardEntrySerializer
+    pagination_class = RankCursorPagination
+
+
+class TrendViewSet(ConditionalGetMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Daily or weekly totals read from the rollup tables.
+
+    ``?period=day|week`` (default day), ``?member=<reg_number>`` (default: everyone),
+    ``?since=`` and ``?until=`` as ISO dates (default: the last year). A year of
+    days is 365 rows however many tasks it covers, so the series isn't paginated.
+    """
+    serializer_class = TaskRollupSerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        params = self.request.query_params
+        period = params.get('period', TaskRollup.DAY)
+        if period not in (TaskRollup.DAY, TaskRollup.WEEK):
+            raise ValidationError({'period': 'Use day or week.'})
+        dates = {}
+        for name in ('since', 'until'):
+            value = params.get(name)
+            dates[name] = parse_date(value) if value else None
+            if value and dates[name] is None:
+                raise ValidationError({name: 'Use an ISO date (YYYY-MM-DD).'})
+        if dates['since'] is None:
+            dates['since'] = (dates['until'] or timezone.localdate()) - timedelta(days=365)
+
+        member = None
+        if params.get('member'):
+            member = Member.objects.filter(reg_number=params['member']).values_list('pk', flat=True).first()
+            if member is None:
+                raise Http404('No such member.')
+        return TaskRollup.objects.trend(period, member, **dates)
+
+
+class TaskEventViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """The task event log in ``seq`` order, for consumers that process changes incrementally.
+
+    Staff only: it is the full history of every member's credits.
+    """
+    permission_classes = [IsAdminUser]
+    queryset = TaskEvent.objects.all()
+    serializer_class = TaskEventSerializer
+    pagination_class = SeqPagination
+
+
+router = DefaultRouter()
+router.register('members', MemberViewSet, basename='api-member')
+router.register('tasks', TaskViewSet, basename='api-task')
+router.register('leaderboard', LeaderboardViewSet, basename='api-leaderboard')
+router.register('trends', TrendViewSet, basename='api-trend')
+router.register('task-events', TaskEventViewSet, basename='api-task-event')
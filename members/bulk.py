@@ -0,0 +1,79 @@
+"""Helpers shared by the bulk loading commands (sample data, imports) and rebuilds."""
+
+import heapq
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import groupby, islice
+from operator import itemgetter
+
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate, TruncWeek
+from django.utils import timezone
+
+ROLLUP_PERIODS = (('day', TruncDate), ('week', TruncWeek))
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create write our own created_at/updated_at instead of now()"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _grouped(tasks, field, trunc):
+    """``((bucket, member_id), tasks, credits)`` per member and bucket of ``field``, sorted"""
+    rows = (
+        tasks.order_by()
+        .annotate(bucket=trunc(field, tzinfo=timezone.get_current_timezone()))
+        .values('bucket', 'member_id')
+        .annotate(n=Count('pk'), credits=Coalesce(Sum('credits'), Value(0)))
+        .order_by('bucket', 'member_id')
+        .values_list('bucket', 'member_id', 'n', 'credits')
+    )
+    for bucket, member_id, n, credits in rows.iterator(chunk_size=2000):
+        if isinstance(bucket, datetime):
+            bucket = bucket.date()
+        yield (bucket, member_id), n, credits
+
+
+def rollup_rows(tasks):
+    """Yield ``(period, start, member_id, credits, created, completed)`` rollups for ``tasks``.
+
+    Tasks count in the bucket of ``created_at``, credits and completions in
+    the bucket of ``completed_at``; ``member_id`` is None for the global
+    rows. The created and completed aggregates come back sorted by bucket and
+    are merged as they stream in, so memory stays flat however many members
+    and days there are.
+    """
+    for period, trunc in ROLLUP_PERIODS:
+        streams = (
+            ((key, (0, n, 0)) for key, n, _ in _grouped(tasks, 'created_at', trunc)),
+            ((key, (credits, 0, n)) for key, n, credits in _grouped(tasks.filter(is_completed=True), 'completed_at', trunc)),
+        )
+        current, overall = None, [0, 0, 0]
+        for (bucket, member_id), group in groupby(heapq.merge(*streams, key=itemgetter(0)), key=itemgetter(0)):
+            totals = [sum(column) for column in zip(*(values for _, values in group))]
+            if bucket != current:
+                if current is not None:
+                    yield (period, current, None, *overall)
+                current, overall = bucket, [0, 0, 0]
+            overall = [a + b for a, b in zip(overall, totals)]
+            yield (period, bucket, member_id, *totals)
+        if current is not None:
+            yield (period, current, None, *overall)
@@ -0,0 +1,165 @@
+"""
+Rendered-page cache for the public tracker views.
+
+Every cached page belongs to one or more invalidation groups (``dashboard``,
+``leaderboard``, ``member:<reg_number>`` ...). Each group has a version number
+stored in the cache and the page key embeds the current versions, so bumping
+a group from members.signals makes every page in it unreachable at once,
+including paginated variants we never enumerate. Works with any Django cache
+backend; use a shared one (file or database) when running several workers.
+Hit and miss counts stay out of the cache: each worker counts in memory and
+adds them to the metrics store (members.metrics) every few seconds.
+
+The same versions double as HTTP validators: every cached page is sent with
+an ETag built from them, and a request whose If-None-Match still matches is
+answered 304 before the view, the cache entry or the template are touched.
+Requests kept on the primary after a write (see members.routers) skip the
+lookup and refresh the entry with what they render.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from . import metrics, routers
+
+DASHBOARD = 'dashboard'
+MEMBER_LIST = 'member_list'
+LEADERBOARD = 'leaderboard'
+RANKING = 'ranking'
+
+HITS = 'falcon_page_cache_hits_total'
+MISSES = 'falcon_page_cache_misses_total'
+
+
+def member_group(reg_number):
+    return f'member:{reg_number}'
+
+
+def _version_key(group):
+    return f'members:version:{group}'
+
+
+def group_versions(groups):
+    """Return the current version of each group, seeding any that are missing"""
+    keys = [_version_key(group) for group in groups]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Seed from the clock so an evicted group never reuses an old version
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*groups):
+    for group in set(groups):
+        try:
+            cache.incr(_version_key(group))
+        except ValueError:
+            cache.set(_version_key(group), time.time_ns(), None)
+
+
+def _count(name):
+    metrics.get_store().increment(name)
+
+
+def stats():
+    """Hits and misses across workers, as of their last metrics flush"""
+    counts = metrics.get_store().totals(HITS, MISSES)
+    hits, misses = int(counts[HITS]), int(counts[MISSES])
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total * 100 if total else 0,
+    }
+
+
+def reset_stats():
+    metrics.get_store().reset(HITS, MISSES)
+
+
+def _finish(response, etag, status):
+    response['ETag'] = etag
+    response['X-Cache'] = status
+    # Proxies and browsers may keep the page but must revalidate it each time
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def _lookup(view, groups, request, args, kwargs):
+    """Return ``(key, etag, response)``; response is None when the view must run"""
+    names = groups(request, *args, **kwargs) if callable(groups) else groups
+    versions = '.'.join(str(v) for v in group_versions(names))
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    key = f'members:page:{view.__name__}:{versions}:{path}'
+    etag = f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+    if routers.reads_from_primary(request):
+        # The entry may hold a lagging replica's render; replace it instead
+        _count(MISSES)
+        return key, etag, None
+
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        _count(HITS)
+        return key, etag, _finish(not_modified, etag, 'REVALIDATED')
+
+    cached = cache.get(key)
+    if cached is not None:
+        _count(HITS)
+        content, content_type = cached
+        return key, etag, _finish(HttpResponse(content, content_type=content_type), etag, 'HIT')
+
+    _count(MISSES)
+    return key, etag, None
+
+
+def _store(key, etag, response):
+    if response.status_code == 200 and not response.streaming:
+        cache.set(
+            key,
+            (response.content, response['Content-Type']),
+            getattr(settings, 'MEMBERS_PAGE_CACHE_TIMEOUT', 300),
+        )
+        return _finish(response, etag, 'MISS')
+    return response
+
+
+def cached_page(groups):
+    """Cache a view's rendered 200 responses under the given invalidation groups.
+
+    ``groups`` is a list of group names or a callable taking the view's
+    arguments and returning one. Async views get an async wrapper that does
+    the cache round trips in a thread.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view(request, *args, **kwargs)
+                key, etag, response = await sync_to_async(_lookup)(view, groups, request, args, kwargs)
+                if response is not None:
+                    return response
+                response = await view(request, *args, **kwargs)
+                return await sync_to_async(_store)(key, etag, response)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key, etag, response = _lookup(view, groups, request, args, kwargs)
+            if response is not None:
+                return response
+            return _store(key, etag, view(request, *args, **kwargs))
+        return wrapper
+    return decorator
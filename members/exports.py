@@ -0,0 +1,185 @@
+"""
+Streaming CSV/NDJSON exports of members, tasks and the leaderboard.
+
+Rows are read with ``values_list().iterator(chunk_size=...)`` (a server-side
+cursor on PostgreSQL) and encoded one line at a time, so memory stays flat no
+matter how many rows are exported. Shared by ``views.export`` and the
+``export_tracker`` management command.
+"""
+
+import csv
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import LeaderboardEntry, Member, Task
+
+CHUNK_SIZE = 2000
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Column name -> ORM lookup, per export kind
+COLUMNS = {
+    'members': {
+        'reg_number': 'reg_number',
+        'name': 'name',
+        'email': 'email',
+        'total_credits': 'total_credits',
+        'total_tasks': 'total_tasks',
+        'completed_tasks': 'completed_tasks',
+        'created_at': 'created_at',
+    },
+    'tasks': {
+        'id': 'pk',
+        'member': 'member__reg_number',
+        'title': 'title',
+        'description': 'description',
+        'credits': 'credits',
+        'is_completed': 'is_completed',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+        'completed_at': 'completed_at',
+        'due_date': 'due_date',
+    },
+    'leaderboard': {
+        # Worked out while streaming, see _ranked
+        'rank': None,
+        'member': 'member__reg_number',
+        'name': 'member__name',
+        'credits': 'credits',
+        'completed_tasks': 'completed_tasks',
+        'total_tasks': 'total_tasks',
+        'completion_rate': 'completion_rate',
+    },
+}
+
+
+# Filters each kind can apply; the leaderboard is a snapshot with no dates
+FILTERS = {
+    'members': {'since', 'until'},
+    'tasks': {'since', 'until', 'completed'},
+    'leaderboard': set(),
+}
+
+# Spreadsheets run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _parse_moment(value, end_of_day=False):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value!r}')
+        moment = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _check_filters(kind, **given):
+    unsupported = sorted(name for name, value in given.items() if value not in (None, '') and name not in FILTERS[kind])
+    if unsupported:
+        raise ValueError(f'The {kind} export has no {", ".join(unsupported)} filter')
+
+
+def parse_filters(kind, since=None, until=None, completed=None):
+    """Turn raw string filters into keyword arguments for ``export_rows``.
+
+    ``until`` given as a plain date includes that whole day. Raises
+    ValueError for a filter ``kind`` doesn't support.
+    """
+    _check_filters(kind, since=since, until=until, completed=completed)
+    filters = {}
+    if since:
+        filters['since'] = _parse_moment(since)
+    if until:
+        filters['until'] = _parse_moment(until, end_of_day=parse_datetime(until) is None)
+    if completed not in (None, ''):
+        if completed.lower() not in ('true', 'false', '1', '0', 'yes', 'no'):
+            raise ValueError(f'Invalid completed filter: {completed!r}')
+        filters['completed'] = completed.lower() in ('true', '1', 'yes')
+    return filters
+
+
+def export_rows(kind, since=None, until=None, completed=None):
+    """Return ``(header, rows)`` where rows is a lazy iterator of tuples"""
+    if kind not in COLUMNS:
+        raise ValueError(f'Unknown export: {kind!r}')
+    _check_filters(kind, since=since, until=until, completed=completed)
+
+    if kind == 'members':
+        queryset = Member.objects.order_by('pk')
+    elif kind == 'tasks':
+        queryset = Task.objects.order_by('pk')
+        if completed is not None:
+            queryset = queryset.filter(is_completed=completed)
+    else:
+        queryset = LeaderboardEntry.objects.order_by('-credits', 'member_id')
+
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+
+    columns = COLUMNS[kind]
+    lookups = [lookup for lookup in columns.values() if lookup is not None]
+    rows = queryset.values_list(*lookups).iterator(chunk_size=CHUNK_SIZE)
+    if kind == 'leaderboard':
+        rows = _ranked(rows, lookups.index('credits'))
+    return list(columns), rows
+
+
+def _ranked(rows, credits_column):
+    """Prepend the competition rank to rows sorted by credits, highest first"""
+    rank = previous = None
+    for position, row in enumerate(rows, start=1):
+        if row[credits_column] != previous:
+            rank, previous = position, row[credits_column]
+        yield (rank, *row)
+
+
+class _Echo:
+    """File-like object whose write() hands the line straight back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def escape_cell(value):
+    """Quote text a spreadsheet would otherwise evaluate; ``unescape_cell`` undoes it"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def unescape_cell(value):
+    if isinstance(value, str) and value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([escape_cell(value) for value in row])
+
+
+def ndjson_lines(header, rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(header, row))) + '\n'
+
+
+def render_lines(fmt, header, rows):
+    if fmt == 'csv':
+        return csv_lines(header, rows)
+    if fmt == 'ndjson':
+        return ndjson_lines(header, rows)
+    raise ValueError(f'Unknown format: {fmt!r}')
@@ -0,0 +1,87 @@
+"""
+Per-request performance counters.
+
+``RequestStats`` is stored in a context variable by
+``members.middleware.RequestMetricsMiddleware``; the database execute wrapper
+and the instrumented template backend add to whichever request is current.
+The execute wrapper is installed on every connection as it is opened, so
+queries run from worker threads by the async views (which inherit the
+request's context) are counted too.
+"""
+
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.template.backends.django import DjangoTemplates, Template
+
+_current = ContextVar('members_request_stats', default=None)
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    sql_ms: float = 0.0
+    template_ms: float = 0.0
+    total_ms: float = 0.0
+    response_bytes: int | None = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.queries += 1
+                self.sql_ms += elapsed
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.record_query(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """``connection_created`` receiver; reconnects reuse the wrapper object"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_ms += (time.perf_counter() - start) * 1000
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend that reports render time to the current request"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
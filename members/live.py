@@ -0,0 +1,244 @@
+"""
+Server-Sent Events for the dashboard and leaderboard.
+
+Task signals (members.signals) append ``LiveEvent`` rows when their
+transaction commits, and every worker's open streams read them back, so the
+table is the fan-out between processes. Within a process one ``EventFeed``
+serves all streams from a shared buffer: however many clients are connected,
+the process queries the table at most once per ``LIVE_EVENTS_POLL_INTERVAL``.
+
+Events are ``task_completed``, ``credits_changed`` (a member's counters
+moved; carries the deltas the dashboard totals need) and ``rank_changed``
+(carries the credit range the move crossed, so a page can shift the ranks
+of the other rows it shows without reloading).
+
+Streams are only offered when ``LIVE_EVENTS_ENABLED`` says the server can
+afford to hold them open (ASGI, threaded or async workers).
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import LeaderboardEntry, LiveEvent
+
+RETRY_MS = 2000
+KEEPALIVE_SECONDS = 15
+
+
+def latest_id():
+    return LiveEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def _rank(credits, member_id):
+    """The member's rank had it ``credits``, against everyone else's current credits"""
+    return LeaderboardEntry.objects.filter(credits__gt=credits).exclude(member_id=member_id).count() + 1
+
+
+def _member_events(moves):
+    """Build credits/rank events from ``sync_member``'s previous values"""
+    entries = LeaderboardEntry.objects.filter(member_id__in=moves).values(
+        'member_id', 'member__reg_number', 'credits', 'total_tasks', 'completed_tasks', 'completion_rate',
+    )
+    events = []
+    for entry in entries:
+        previous = moves[entry['member_id']]
+        delta = {
+            'credits': entry['credits'] - previous['credits'],
+            'tasks': entry['total_tasks'] - previous['total_tasks'],
+            'completed': entry['completed_tasks'] - previous['completed_tasks'],
+        }
+        if not any(delta.values()):
+            continue
+        member = entry['member__reg_number']
+        events.append(LiveEvent(kind=LiveEvent.CREDITS_CHANGED, data={
+            'member': member,
+            'credits': entry['credits'],
+            'total_tasks': entry['total_tasks'],
+            'completed_tasks': entry['completed_tasks'],
+            'completion_rate': round(entry['completion_rate'], 1),
+            'delta': delta,
+        }))
+        if delta['credits']:
+            events.append(LiveEvent(kind=LiveEvent.RANK_CHANGED, data={
+                'member': member,
+                'rank': _rank(entry['credits'], entry['member_id']),
+                'previous_rank': _rank(previous['credits'], entry['member_id']),
+                'credits': entry['credits'],
+                'previous_credits': previous['credits'],
+            }))
+    return events
+
+
+def publish_task_change(task, moves, completed_by=None):
+    """Queue the events for one task save or delete until the transaction commits.
+
+    ``moves`` maps member ids to what ``sync_member`` returned for them.
+    ``completed_by`` is the member's reg number when the save completed the task.
+    """
+    events = []
+    if completed_by is not None:
+        events.append(LiveEvent(kind=LiveEvent.TASK_COMPLETED, data={
+            'task': task.pk,
+            'title': task.title,
+            'credits': task.credits,
+            'member': completed_by,
+        }))
+    events += _member_events({member_id: previous for member_id, previous in moves.items() if previous})
+    if events:
+        # The save has committed by now; a failed insert only loses the events
+        transaction.on_commit(lambda: _write(events), robust=True)
+
+
+def publish_member_removed(member):
+    """Queue the events for a deleted member whose tasks went with it.
+
+    Its counters drop to zero in one move rather than one event per task.
+    Call it before the member's leaderboard entry is removed.
+    """
+    entry = LeaderboardEntry.objects.filter(member_id=member.pk).values(
+        'credits', 'total_tasks', 'completed_tasks',
+    ).first()
+    if entry is None:
+        return
+    delta = {'credits': -entry['credits'], 'tasks': -entry['total_tasks'], 'completed': -entry['completed_tasks']}
+    if not any(delta.values()):
+        return
+    events = [LiveEvent(kind=LiveEvent.CREDITS_CHANGED, data={
+        'member': member.reg_number,
+        'credits': 0,
+        'total_tasks': 0,
+        'completed_tasks': 0,
+        'completion_rate': 0,
+        'delta': delta,
+    })]
+    if entry['credits']:
+        events.append(LiveEvent(kind=LiveEvent.RANK_CHANGED, data={
+            'member': member.reg_number,
+            'rank': _rank(0, member.pk),
+            'previous_rank': _rank(entry['credits'], member.pk),
+            'credits': 0,
+            'previous_credits': entry['credits'],
+        }))
+    transaction.on_commit(lambda: _write(events), robust=True)
+
+
+def _write(events):
+    created = LiveEvent.objects.bulk_create(events)
+    last = created[-1].pk
+    keep = getattr(settings, 'LIVE_EVENTS_KEEP', 10000)
+    # Prune now and then rather than on every write
+    if last is not None and last // 100 != (last - len(created)) // 100:
+        LiveEvent.objects.filter(pk__lte=last - keep).delete()
+
+
+class EventFeed:
+    """Process-wide buffer of recent events shared by every open stream"""
+
+    def __init__(self, size=1000):
+        self.size = size
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=self.size)
+        self._high_water = None
+        self._polled_at = 0.0
+
+    def since(self, last_id):
+        """Return the ``(id, kind, data)`` rows after ``last_id`` and the id to poll from next.
+
+        ``last_id=None`` means "from now on".
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._high_water is None or now - self._polled_at >= settings.LIVE_EVENTS_POLL_INTERVAL:
+                self._refresh()
+                self._polled_at = now
+            high_water = self._high_water
+            if last_id is None or last_id >= high_water:
+                return [], high_water
+            if self._events and self._events[0][0] <= last_id + 1:
+                return [event for event in self._events if event[0] > last_id], high_water
+        # The client is further behind than the buffer (a reconnect after a
+        # long gap, or a page older than this process); read it from the table.
+        rows = list(
+            LiveEvent.objects.filter(pk__gt=last_id, pk__lte=high_water)
+            .order_by('pk').values_list('pk', 'kind', 'data')[:self.size]
+        )
+        return rows, rows[-1][0] if len(rows) == self.size else high_water
+
+    def _refresh(self):
+        if self._high_water is None:
+            self._high_water = latest_id()
+            return
+        rows = LiveEvent.objects.filter(pk__gt=self._high_water).order_by('pk').values_list('pk', 'kind', 'data')
+        for row in rows[:self.size]:
+            self._events.append(row)
+            self._high_water = row[0]
+
+
+feed = EventFeed()
+
+
+def _format(event_id, kind, data):
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _poll(last_id):
+    """One poll for a stream; returns the lines to send and the new position"""
+    events, position = feed.since(last_id)
+    return [_format(*event) for event in events], position
+
+
+def stream(last_id=None):
+    """Event stream for sync workers.
+
+    Ends after ``LIVE_EVENTS_MAX_STREAM`` seconds so a stream can't hold a
+    worker forever; EventSource reconnects with Last-Event-ID and resumes.
+    """
+    yield f"retry: {RETRY_MS}\n\n"
+    max_stream = getattr(settings, 'LIVE_EVENTS_MAX_STREAM', 30)
+    started = last_sent = time.monotonic()
+    while True:
+        lines, last_id = _poll(last_id)
+        now = time.monotonic()
+        if lines:
+            yield ''.join(lines)
+            last_sent = now
+        elif now - last_sent >= KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            last_sent = now
+        if max_stream and now - started >= max_stream:
+            return
+        time.sleep(settings.LIVE_EVENTS_POLL_INTERVAL)
+
+
+def _poll_in_thread(last_id):
+    close_old_connections()
+    try:
+        return _poll(last_id)
+    finally:
+        close_old_connections()
+
+
+async def astream(last_id=None):
+    """Event stream for ASGI; an idle stream costs a sleeping coroutine, not a thread"""
+    yield f"retry: {RETRY_MS}\n\n"
+    last_sent = time.monotonic()
+    while True:
+        lines, last_id = await sync_to_async(_poll_in_thread, thread_sensitive=False)(last_id)
+        now = time.monotonic()
+        if lines:
+            yield ''.join(lines)
+            last_sent = now
+        elif now - last_sent >= KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            last_sent = now
+        await asyncio.sleep(settings.LIVE_EVENTS_POLL_INTERVAL)
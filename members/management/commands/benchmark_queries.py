@@ -0,0 +1,94 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum, Value
+from members.models import LeaderboardEntry, Member, Task
+
+
+# Added by members.0004_query_indexes for the queries below
+QUERY_INDEXES = ('member_recent_idx', 'task_member_recent_idx', 'task_recent_idx', 'task_completed_credits_idx')
+
+
+def hot_queries(member_id):
+    """The queries the tracker pages run on every request, keyed by a short name"""
+    return {
+        'member_tasks_page': Task.objects.filter(member_id=member_id).order_by('-created_at', '-pk')[:100],
+        'member_completed_credits': Task.objects.filter(member_id=member_id, is_completed=True)
+            .values('member').annotate(total=Sum('credits')),
+        'recent_tasks': Task.objects.select_related('member').order_by('-created_at')[:5],
+        'recent_members': Member.objects.order_by('-created_at')[:5],
+        'top_performers': Member.objects.order_by('-total_credits', 'name')[:5],
+        'leaderboard_page': LeaderboardEntry.objects.ranked()[:50],
+        # views._dashboard_headline, as a queryset so it can be explained
+        'dashboard_headline': Member.objects.annotate(all=Value(1)).values('all').annotate(
+            members=Count('pk'), tasks=Sum('total_tasks'),
+            completed=Sum('completed_tasks'), credits=Sum('total_credits'),
+        ).order_by(),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the tracker\'s hot queries and print their plans. Run it with and '
+        'without --without-indexes to compare against the schema before '
+        'members.0004_query_indexes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50, help='Executions per query (default: 50)')
+        parser.add_argument('--explain', action='store_true', help='Print the query plan for each query')
+        parser.add_argument('--json', dest='json_path', help='Also write the timings to this JSON file')
+        parser.add_argument(
+            '--without-indexes', action='store_true',
+            help='Drop the members.0004_query_indexes indexes for the run; the drop is rolled back afterwards',
+        )
+
+    def handle(self, *args, **options):
+        member = Member.objects.order_by('-total_tasks').only('pk').first()
+        if member is None:
+            raise CommandError('No members found; run create_sample_data first.')
+
+        if not options['without_indexes']:
+            return self.run(member, options)
+        # SQLite and PostgreSQL both roll DDL back, so the indexes come back
+        # untouched. Writers wait for the run to finish meanwhile.
+        drop_index = connection.schema_editor().sql_delete_index
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for name in QUERY_INDEXES:
+                    cursor.execute(drop_index % {'name': connection.ops.quote_name(name)})
+            self.run(member, options)
+            transaction.set_rollback(True)
+
+    def run(self, member, options):
+        results = {}
+        for name, queryset in hot_queries(member.pk).items():
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = {
+                'median_ms': round(statistics.median(timings), 3),
+                'max_ms': round(max(timings), 3),
+            }
+            self.stdout.write(
+                f"{name:<26} median {results[name]['median_ms']:>9.3f} ms   max {results[name]['max_ms']:>9.3f} ms"
+            )
+            if options['explain']:
+                for line in queryset.explain().splitlines():
+                    self.stdout.write(f'    {line}')
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as fh:
+                json.dump({
+                    'vendor': connection.vendor,
+                    'indexes': not options['without_indexes'],
+                    'members': Member.objects.count(),
+                    'tasks': Task.objects.count(),
+                    'queries': results,
+                }, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['json_path']}"))
@@ -0,0 +1,183 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+from members.management.commands.benchmark_views import percentile
+from members.models import Member, Task
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare SQLite profiles (SQLITE_PROFILES in settings) under concurrent reads and writes. '
+        'Each profile gets its own seeded database file; worker processes standing in for gunicorn '
+        'workers then render tracker pages and toggle task completion against it at the same time. '
+        'Reports throughput, latency percentiles and "database is locked" failures per profile.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='default,production', help='Comma-separated SQLITE_PROFILES to compare (default: default,production)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() * 2 + 1, help='Concurrent processes (default: 2n+1, like gunicorn)')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of load per profile (default: 10)')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Share of operations that are writes (default: 0.2)')
+        parser.add_argument('--members', type=int, default=500, help='Members seeded per database (default: 500)')
+        parser.add_argument('--tasks-per-member', type=int, default=10, help='Tasks seeded per member (default: 10)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        # Internal: run as one load process against the current database
+        parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+        parser.add_argument('--start-at', type=float, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['worker'] is not None:
+            return self.run_worker(options)
+        if settings.DATABASES['default']['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('benchmark_sqlite needs the SQLite backend.')
+        profiles = [profile for profile in options['profiles'].split(',') if profile]
+        unknown = set(profiles) - set(settings.SQLITE_PROFILES)
+        if unknown:
+            raise CommandError(f'Unknown SQLite profile(s): {", ".join(sorted(unknown))}')
+
+        results = {'workers': options['workers'], 'write_ratio': options['write_ratio'], 'profiles': {}}
+        with tempfile.TemporaryDirectory() as tmp:
+            for profile in profiles:
+                env = {
+                    **os.environ,
+                    'DATABASE_URL': '',
+                    'SQLITE_PATH': str(Path(tmp) / f'{profile}.sqlite3'),
+                    'SQLITE_PROFILE': profile,
+                    'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'falcon.settings'),
+                }
+                self.stdout.write(f'Seeding {options["members"]} members for the {profile!r} profile...')
+                self.manage(env, 'migrate', '--verbosity', '0')
+                self.manage(
+                    env, 'create_sample_data', '--members', str(options['members']),
+                    '--tasks-per-member', str(options['tasks_per_member']), '--seed', str(options['seed']),
+                )
+                self.stdout.write(f'Running {options["workers"]} processes for {options["duration"]:g}s...')
+                results['profiles'][profile] = self.run_profile(env, options)
+
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def manage(self, env, *args):
+        subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), *args],
+            cwd=settings.BASE_DIR, env=env, check=True, stdout=subprocess.DEVNULL,
+        )
+
+    def run_profile(self, env, options):
+        # Leave time for every process to import Django before the clock starts
+        start_at = time.time() + 3
+        workers = [
+            subprocess.Popen(
+                [
+                    sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_sqlite',
+                    '--worker', str(index), '--start-at', str(start_at),
+                    '--duration', str(options['duration']), '--write-ratio', str(options['write_ratio']),
+                    '--seed', str(options['seed']),
+                ],
+                cwd=settings.BASE_DIR, env=env, stdout=subprocess.PIPE, text=True,
+            )
+            for index in range(options['workers'])
+        ]
+        samples = {'read': [], 'write': []}
+        locked = {'read': 0, 'write': 0}
+        for worker in workers:
+            output, _ = worker.communicate()
+            if worker.returncode:
+                raise CommandError(f'A benchmark worker exited with status {worker.returncode}')
+            result = json.loads(output.strip().splitlines()[-1])
+            for kind in samples:
+                samples[kind] += result['samples'][kind]
+                locked[kind] += result['locked'][kind]
+
+        operations = len(samples['read']) + len(samples['write'])
+        return {
+            'throughput_ops': round(operations / options['duration'], 1),
+            'locked_errors': sum(locked.values()),
+            **{kind: {**self.latency_summary(values), 'locked': locked[kind]} for kind, values in samples.items()},
+        }
+
+    def latency_summary(self, values):
+        values = sorted(values)
+        if not values:
+            return {'ops': 0}
+        return {
+            'ops': len(values),
+            'p50_ms': round(percentile(values, 50), 2),
+            'p95_ms': round(percentile(values, 95), 2),
+            'p99_ms': round(percentile(values, 99), 2),
+        }
+
+    def run_worker(self, options):
+        if str(connection.settings_dict['NAME']) != os.environ.get('SQLITE_PATH'):
+            raise CommandError('The settings module ignores SQLITE_PATH; run benchmark_sqlite with falcon.settings.')
+        setup_test_environment()
+        rng = random.Random(options['seed'] * 1000 + options['worker'])
+        regs = list(Member.objects.values_list('reg_number', flat=True))
+        task_ids = list(Task.objects.values_list('pk', flat=True))
+        close_old_connections()
+        pages = [reverse('members:dashboard'), reverse('members:leaderboard')]
+
+        samples = {'read': [], 'write': []}
+        locked = {'read': 0, 'write': 0}
+        with override_settings(CACHES=LOCAL_CACHE, METRICS_ENABLED=False):
+            client = Client()
+            time.sleep(max(0, options['start_at'] - time.time()))
+            deadline = time.monotonic() + options['duration']
+            while time.monotonic() < deadline:
+                kind = 'write' if rng.random() < options['write_ratio'] else 'read'
+                start = time.perf_counter()
+                try:
+                    if kind == 'write':
+                        self.toggle_task(rng.choice(task_ids))
+                    elif rng.random() < 0.5:
+                        client.get(reverse('members:member_detail', args=[rng.choice(regs)]))
+                    else:
+                        client.get(rng.choice(pages))
+                except OperationalError:
+                    locked[kind] += 1
+                    continue
+                samples[kind].append((time.perf_counter() - start) * 1000)
+        self.stdout.write(json.dumps({'samples': samples, 'locked': locked}))
+
+    def toggle_task(self, pk):
+        """What TaskAdmin's list_editable does for one row, bounded like a request"""
+        try:
+            task = Task.objects.get(pk=pk)
+            task.is_completed = not task.is_completed
+            task.save()
+        finally:
+            close_old_connections()
+
+    def report(self, results):
+        for profile, stats in results['profiles'].items():
+            self.stdout.write(
+                f"{profile}: {stats['throughput_ops']} ops/s, {stats['locked_errors']} 'database is locked' errors"
+            )
+            for kind in ('read', 'write'):
+                row = stats[kind]
+                if not row['ops']:
+                    self.stdout.write(f'  {kind:<6} no successful operations')
+                    continue
+                self.stdout.write(
+                    f"  {kind:<6} {row['ops']:>7}  p50 {row['p50_ms']:>8.1f} ms  "
+                    f"p95 {row['p95_ms']:>8.1f} ms  p99 {row['p99_ms']:>8.1f} ms"
+                )
@@ -0,0 +1,160 @@
+import json
+import logging
+import statistics
+import subprocess
+import time
+import tracemalloc
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from members.models import Member
+
+TARGETS = (
+    'dashboard',
+    'member_list',
+    'leaderboard',
+    'member_detail',
+    'admin_member_changelist',
+    'admin_task_changelist',
+)
+
+NO_PAGE_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database at several scales and measure latency percentiles, '
+        'query counts and peak memory for the public views and admin changelists. '
+        'Writes JSON that can be diffed between commits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1000,10000,100000', help='Comma-separated member counts (default: 1000,10000,100000)')
+        parser.add_argument('--tasks-per-member', type=int, default=10, help='Tasks seeded per member (default: 10)')
+        parser.add_argument('--requests', type=int, default=20, help='Timed requests per view (default: 20)')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per view first (default: 2)')
+        parser.add_argument('--targets', default=','.join(TARGETS), help=f'Subset of: {", ".join(TARGETS)}')
+        parser.add_argument('--page-cache', action='store_true', help='Leave the page cache on (default measures uncached rendering)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Write results as JSON to this file')
+
+    def handle(self, *args, **options):
+        scales = sorted(int(scale) for scale in options['scales'].split(','))
+        targets = [target for target in options['targets'].split(',') if target]
+        overrides = {'METRICS_ENABLED': False}
+        if not options['page_cache']:
+            overrides['CACHES'] = NO_PAGE_CACHE
+
+        results = {
+            'commit': self.git_revision(),
+            'vendor': connection.vendor,
+            'tasks_per_member': options['tasks_per_member'],
+            'page_cache': options['page_cache'],
+            'scales': {},
+        }
+
+        # Budget overruns are the point of the exercise; keep them out of the report.
+        logging.getLogger('members.performance').setLevel(logging.ERROR)
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(**overrides):
+                client = Client()
+                user = get_user_model().objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+                client.force_login(user)
+
+                seeded = 0
+                for scale in scales:
+                    self.stdout.write(f'Seeding {scale} members...')
+                    call_command(
+                        'create_sample_data',
+                        members=scale - seeded,
+                        tasks_per_member=options['tasks_per_member'],
+                        seed=options['seed'] + scale,
+                        batch_size=5000,
+                        append=True,
+                        verbosity=0,
+                        stdout=StringIO(),
+                    )
+                    seeded = scale
+                    results['scales'][scale] = {
+                        target: self.measure(client, target, options) for target in targets
+                    }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def url_for(self, target):
+        if target == 'member_detail':
+            member = Member.objects.order_by('-total_tasks', 'pk').only('reg_number').first()
+            return reverse('members:member_detail', args=[member.reg_number])
+        if target.startswith('admin_'):
+            model = target[len('admin_'):-len('_changelist')]
+            return reverse(f'admin:members_{model}_changelist')
+        return reverse(f'members:{target}')
+
+    def measure(self, client, target, options):
+        url = self.url_for(target)
+        for _ in range(options['warmup']):
+            client.get(url)
+
+        timings = []
+        for _ in range(options['requests']):
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        # request_started clears the query log, so start the capture from an empty one.
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        # Counted now: the capture reads the query log lazily, and the next
+        # request clears it.
+        query_count = len(queries)
+
+        tracemalloc.start()
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings.sort()
+        result = {
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'p99_ms': round(percentile(timings, 99), 2),
+            'mean_ms': round(statistics.fmean(timings), 2),
+            'queries': query_count,
+            'peak_memory_kb': round(peak / 1024),
+            'response_bytes': len(response.content),
+        }
+        self.stdout.write(
+            f"  {target:<24} p50 {result['p50_ms']:>8.1f} ms  p95 {result['p95_ms']:>8.1f} ms  "
+            f"p99 {result['p99_ms']:>8.1f} ms  {result['queries']:>3} queries  "
+            f"{result['peak_memory_kb']:>7} KB peak  {result['response_bytes']:>9} bytes"
+        )
+        return result
+
+    def git_revision(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
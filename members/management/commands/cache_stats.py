@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from members import cache
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters for the tracker page cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+
+    def handle(self, *args, **options):
+        stats = cache.stats()
+        self.stdout.write(
+            f"hits: {stats['hits']}  misses: {stats['misses']}  hit rate: {stats['hit_rate']:.1f}%"
+        )
+        if options['reset']:
+            cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
@@ -1,120 +1,205 @@
+from itertools import count, islice
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
 from django.utils import timezone
 from datetime import timedelta
-from members.models import Member, Task
+from members import cache, search
+from members.bulk import chunked, explicit_timestamps
+from members.models import LeaderboardEntry, LiveEvent, Member, Task, TaskEvent, TaskRollup
 import random
+import time
+
+# Sample members data
+MEMBERS_DATA = [
+    {'name': 'Alice Johnson', 'reg_number': 'REG001', 'email': 'alice.johnson@example.com'},
+    {'name': 'Bob Smith', 'reg_number': 'REG002', 'email': 'bob.smith@example.com'},
+    {'name': 'Charlie Brown', 'reg_number': 'REG003', 'email': 'charlie.brown@example.com'},
+    {'name': 'Diana Ross', 'reg_number': 'REG004', 'email': 'diana.ross@example.com'},
+    {'name': 'Edward Wilson', 'reg_number': 'REG005', 'email': 'edward.wilson@example.com'},
+    {'name': 'Fiona Davis', 'reg_number': 'REG006', 'email': 'fiona.davis@example.com'},
+    {'name': 'George Miller', 'reg_number': 'REG007', 'email': 'george.miller@example.com'},
+    {'name': 'Hannah Lee', 'reg_number': 'REG008', 'email': 'hannah.lee@example.com'},
+]
+
+FIRST_NAMES = [
+    'Alice', 'Bob', 'Charlie', 'Diana', 'Edward', 'Fiona', 'George', 'Hannah',
+    'Ivan', 'Julia', 'Kevin', 'Laura', 'Mohan', 'Nadia', 'Oscar', 'Priya',
+]
+LAST_NAMES = [
+    'Johnson', 'Smith', 'Brown', 'Ross', 'Wilson', 'Davis', 'Miller', 'Lee',
+    'Garcia', 'Nair', 'Khan', 'Evans', 'Mehta', 'Silva', 'Turner', 'Walker',
+]
+
+# Sample tasks data
+TASKS_DATA = [
+    ('Complete project documentation', 'This task involves creating comprehensive documentation for the project.'),
+    ('Review code implementation', 'Review the codebase and provide feedback on implementation quality.'),
+    ('Prepare presentation slides', 'Prepare slides for the upcoming team presentation.'),
+    ('Conduct user testing', 'Conduct thorough testing with end users to gather feedback.'),
+    ('Write unit tests', 'Write comprehensive unit tests to ensure code quality.'),
+    ('Design database schema', 'Design an efficient and scalable database schema.'),
+    ('Implement authentication', 'Implement secure user authentication and authorization.'),
+    ('Create API endpoints', 'Create RESTful API endpoints for the application.'),
+    ('Update user interface', 'Update the user interface to improve user experience.'),
+    ('Optimize performance', 'Optimize application performance and reduce load times.'),
+    ('Fix reported bugs', 'Investigate and fix bugs reported by users.'),
+    ('Research new technologies', 'Research emerging technologies that could benefit the project.'),
+    ('Setup development environment', 'Setup a consistent development environment for the team.'),
+    ('Deploy to staging', 'Deploy the application to the staging environment.'),
+    ('Create user manual', 'Create detailed user documentation and guides.'),
+    ('Analyze requirements', 'Analyze project requirements and create specifications.'),
+    ('Design system architecture', 'Design the overall system architecture and components.'),
+    ('Implement data validation', 'Implement robust data validation and error handling.'),
+    ('Create backup strategy', 'Create a comprehensive backup and recovery strategy.'),
+    ('Monitor system metrics', 'Setup monitoring to track system performance and health.'),
+]
+
 
 class Command(BaseCommand):
     help = 'Create sample data for the Team Tracker application'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, help='Number of members to create (default: the 8 sample members)')
+        parser.add_argument('--tasks-per-member', type=int, help='Tasks per member (default: random 3-8)')
+        parser.add_argument('--seed', type=int, help='Random seed for a reproducible dataset')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT and per transaction (default: 1000)')
+        parser.add_argument('--days', type=int, default=60, help='Spread creation dates over this many past days (default: 60)')
+        parser.add_argument('--append', action='store_true', help='Add to the existing data instead of replacing it')
+
     def handle(self, *args, **options):
-        # Clear existing data
-        Task.objects.all().delete()
-        Member.objects.all().delete()
-
-        # Sample members data
-        members_data = [
-            {'name': 'Alice Johnson', 'reg_number': 'REG001', 'email': 'alice.johnson@example.com'},
-            {'name': 'Bob Smith', 'reg_number': 'REG002', 'email': 'bob.smith@example.com'},
-            {'name': 'Charlie Brown', 'reg_number': 'REG003', 'email': 'charlie.brown@example.com'},
-            {'name': 'Diana Ross', 'reg_number': 'REG004', 'email': 'diana.ross@example.com'},
-            {'name': 'Edward Wilson', 'reg_number': 'REG005', 'email': 'edward.wilson@example.com'},
-            {'name': 'Fiona Davis', 'reg_number': 'REG006', 'email': 'fiona.davis@example.com'},
-            {'name': 'George Miller', 'reg_number': 'REG007', 'email': 'george.miller@example.com'},
-            {'name': 'Hannah Lee', 'reg_number': 'REG008', 'email': 'hannah.lee@example.com'},
-        ]
-
-        # Create members
-        members = []
-        for member_data in members_data:
-            member = Member.objects.create(**member_data)
-            members.append(member)
-            self.stdout.write(f'Created member: {member.name}')
-
-        # Sample tasks data
-        task_titles = [
-            'Complete project documentation',
-            'Review code implementation',
-            'Prepare presentation slides',
-            'Conduct user testing',
-            'Write unit tests',
-            'Design database schema',
-            'Implement authentication',
-            'Create API endpoints',
-            'Update user interface',
-            'Optimize performance',
-            'Fix reported bugs',
-            'Research new technologies',
-            'Setup development environment',
-            'Deploy to staging',
-            'Create user manual',
-            'Analyze requirements',
-            'Design system architecture',
-            'Implement data validation',
-            'Create backup strategy',
-            'Monitor system metrics',
-        ]
-
-        task_descriptions = [
-            'This task involves creating comprehensive documentation for the project.',
-            'Review the codebase and provide feedback on implementation quality.',
-            'Prepare slides for the upcoming team presentation.',
-            'Conduct thorough testing with end users to gather feedback.',
-            'Write comprehensive unit tests to ensure code quality.',
-            'Design an efficient and scalable database schema.',
-            'Implement secure user authentication and authorization.',
-            'Create RESTful API endpoints for the application.',
-            'Update the user interface to improve user experience.',
-            'Optimize application performance and reduce load times.',
-            'Investigate and fix bugs reported by users.',
-            'Research emerging technologies that could benefit the project.',
-            'Setup a consistent development environment for the team.',
-            'Deploy the application to the staging environment.',
-            'Create detailed user documentation and guides.',
-            'Analyze project requirements and create specifications.',
-            'Design the overall system architecture and components.',
-            'Implement robust data validation and error handling.',
-            'Create a comprehensive backup and recovery strategy.',
-            'Setup monitoring to track system performance and health.',
-        ]
-
-        # Create tasks for each member
-        for member in members:
-            num_tasks = random.randint(3, 8)
-            member_tasks = random.sample(list(zip(task_titles, task_descriptions)), num_tasks)
-            
-            for i, (title, description) in enumerate(member_tasks):
-                # Random completion status (70% chance of completion)
-                is_completed = random.random() < 0.7
-                
-                # Random credits between 10 and 100
-                credits = random.randint(1, 10) * 10
-                
-                # Random due date (within next 30 days)
-                due_date = timezone.now() + timedelta(days=random.randint(1, 30))
-                
-                # Random creation date (within last 60 days)
-                created_days_ago = random.randint(1, 60)
-                created_at = timezone.now() - timedelta(days=created_days_ago)
-                
-                task = Task.objects.create(
-                    member=member,
-                    title=f"{title} - {member.name}",
-                    description=description,
-                    credits=credits,
-                    is_completed=is_completed,
-                    due_date=due_date,
-                )
-                
-                # Update created_at to simulate historical data
-                task.created_at = created_at
-                task.save()
-                
-                status = "✅" if is_completed else "⏳"
-                self.stdout.write(f'  {status} Created task: {task.title} ({credits} credits)')
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        n_members = options['members'] if options['members'] is not None else len(MEMBERS_DATA)
+        verbose = options['verbosity'] > 1 or options['members'] is None
+        self.now = timezone.now()
+        started = time.perf_counter()
+
+        if not options['append']:
+            self.clear_existing_data()
+
+        existing_regs = set(Member.objects.values_list('reg_number', flat=True))
+        existing_emails = set(Member.objects.values_list('email', flat=True))
+        candidates = (
+            m for m in self.member_candidates()
+            if m['reg_number'] not in existing_regs and m['email'] not in existing_emails
+        )
+
+        members_created = tasks_created = 0
+        with explicit_timestamps(Member, Task):
+            for member_batch in chunked(islice(candidates, n_members), batch_size):
+                with transaction.atomic():
+                    created, tasks = self.create_batch(member_batch, rng, options, batch_size, verbose)
+                members_created += created
+                tasks_created += tasks
+                if not verbose:
+                    self.stdout.write(f'  {members_created} members, {tasks_created} tasks...')
+
+        # bulk_create skips the signals that normally maintain these
+        LeaderboardEntry.objects.rebuild()
+        TaskRollup.objects.rebuild()
+        search.rebuild()
+        cache.invalidate(cache.DASHBOARD, cache.MEMBER_LIST, cache.LEADERBOARD, cache.RANKING)
 
+        elapsed = time.perf_counter() - started
+        rows = members_created + tasks_created
         self.stdout.write(
             self.style.SUCCESS(
-                f'\nSuccessfully created {len(members)} members and {Task.objects.count()} tasks!'
+                f'\nSuccessfully created {members_created} members and {tasks_created} tasks '
+                f'in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} rows/sec)!'
             )
         )
+
+    def clear_existing_data(self):
+        # A plain DELETE per table; Model.delete() would fire signals for every row.
+        # The task event log is append-only and keeps its rows.
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for model in (TaskRollup, Task, LeaderboardEntry, Member, LiveEvent):
+                    cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+            search.rebuild()
+            # Tells event consumers their copy is stale
+            TaskEvent.objects.append([TaskEvent(kind=TaskEvent.RESET, task_id=0, member_id=0, credits=0)])
+        cache.invalidate(cache.DASHBOARD, cache.MEMBER_LIST, cache.LEADERBOARD, cache.RANKING)
+
+    def member_candidates(self):
+        yield from MEMBERS_DATA
+        for n in count(len(MEMBERS_DATA) + 1):
+            first = FIRST_NAMES[n % len(FIRST_NAMES)]
+            last = LAST_NAMES[(n // len(FIRST_NAMES)) % len(LAST_NAMES)]
+            yield {
+                'name': f'{first} {last}',
+                'reg_number': f'REG{n:03d}',
+                'email': f'{first.lower()}.{last.lower()}.{n}@example.com',
+            }
+
+    def random_past(self, rng, days, not_before=None):
+        # Skew towards recent dates, as activity grows over time
+        moment = self.now - timedelta(days=days * (1 - rng.random() ** 0.5))
+        return max(moment, not_before) if not_before else moment
+
+    def create_batch(self, member_batch, rng, options, batch_size, verbose):
+        days = options['days']
+        members, task_specs = [], []
+        for member_data in member_batch:
+            joined = self.random_past(rng, days)
+            num_tasks = options['tasks_per_member']
+            if num_tasks is None:
+                num_tasks = rng.randint(3, 8)
+            specs = []
+            for _ in range(num_tasks):
+                title, description = TASKS_DATA[rng.randrange(len(TASKS_DATA))]
+                created_at = self.random_past(rng, days, not_before=joined)
+                # Older tasks are more likely to be done (70% overall)
+                age = (self.now - created_at) / timedelta(days=max(days, 1))
+                is_completed = rng.random() < 0.6 + 0.45 * age
+                completed_at = created_at + (self.now - created_at) * rng.random() if is_completed else None
+                specs.append((
+                    f"{title} - {member_data['name']}",
+                    description,
+                    rng.randint(1, 10) * 10,
+                    is_completed,
+                    created_at,
+                    created_at + timedelta(days=rng.randint(1, 30)),
+                    completed_at,
+                ))
+            members.append(Member(
+                **member_data,
+                created_at=joined,
+                updated_at=joined,
+                total_tasks=len(specs),
+                completed_tasks=sum(1 for spec in specs if spec[3]),
+                total_credits=sum(spec[2] for spec in specs if spec[3]),
+            ))
+            task_specs.append(specs)
+
+        Member.objects.bulk_create(members, batch_size=batch_size)
+
+        tasks = (
+            Task(
+                member=member,
+                title=title,
+                description=description,
+                credits=credits,
+                is_completed=is_completed,
+                created_at=created_at,
+                updated_at=completed_at or created_at,
+                completed_at=completed_at,
+                due_date=due_date,
+            )
+            for member, specs in zip(members, task_specs)
+            for title, description, credits, is_completed, created_at, due_date, completed_at in specs
+        )
+        task_count = 0
+        for task_batch in chunked(tasks, batch_size):
+            Task.objects.bulk_create(task_batch)
+            TaskEvent.objects.append([event for task in task_batch for event in TaskEvent.for_change(task)])
+            task_count += len(task_batch)
+            if verbose:
+                for task in task_batch:
+                    status = "✅" if task.is_completed else "⏳"
+                    self.stdout.write(f'  {status} Created task: {task.title} ({task.credits} credits)')
+
+        if verbose:
+            for member in members:
+                self.stdout.write(f'Created member: {member.name}')
+        return len(members), task_count
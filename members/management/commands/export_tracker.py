@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from members import exports
+
+
+class Command(BaseCommand):
+    help = 'Stream members, tasks or the leaderboard to CSV or NDJSON with constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(exports.COLUMNS))
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+        parser.add_argument('--since', help='Members and tasks only: rows created on/after this date or datetime')
+        parser.add_argument('--until', help='Members and tasks only: rows created up to this date (inclusive) or datetime')
+        parser.add_argument('--completed', help='Tasks only: true or false')
+
+    def handle(self, *args, **options):
+        try:
+            filters = exports.parse_filters(
+                options['kind'],
+                since=options['since'],
+                until=options['until'],
+                completed=options['completed'],
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        header, rows = exports.export_rows(options['kind'], **filters)
+        lines = exports.render_lines(options['format'], header, rows)
+
+        if options['output']:
+            count = 0
+            with open(options['output'], 'w', newline='', encoding='utf-8') as fh:
+                for line in lines:
+                    fh.write(line)
+                    count += 1
+            if options['format'] == 'csv':
+                count -= 1
+            self.stderr.write(self.style.SUCCESS(f"Exported {count} rows to {options['output']}"))
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
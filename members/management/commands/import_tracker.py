@@ -0,0 +1,267 @@
+import csv
+import json
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from members import cache, search
+from members.exports import unescape_cell
+from members.bulk import chunked, explicit_timestamps
+from members.models import LeaderboardEntry, Member, Task, TaskEvent, TaskRollup
+
+MEMBER_FIELDS = ('name', 'reg_number', 'email')
+TASK_FIELDS = ('title', 'description', 'credits', 'is_completed', 'created_at', 'completed_at', 'due_date')
+# Same spellings as the exports' completed filter
+BOOLEANS = {'true': True, '1': True, 'yes': True, 'false': False, '0': False, 'no': False}
+# Past this many touched members or tasks, rebuilding the leaderboard, rollups
+# and search index outright is cheaper than updating them row by row
+FULL_REBUILD_AT = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream members or tasks from CSV/NDJSON and upsert them in batches. Members '
+        'are keyed on reg_number; tasks on id when the file has one. Progress is '
+        'checkpointed after every committed batch, with the rows touched so far, so '
+        '--resume continues from there. '
+        'Task changes are appended to the event log. '
+        'The leaderboard, rollups and search index are updated for the touched rows, '
+        f'or rebuilt when more than {FULL_REBUILD_AT} members or tasks were touched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['members', 'tasks'])
+        parser.add_argument('path', help='CSV or NDJSON file, e.g. one written by export_tracker')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per upsert and per transaction (default: 1000)')
+        parser.add_argument('--resume', action='store_true', help='Skip the rows already committed by a previous run')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        self.checkpoint_path = f'{path}.checkpoint'
+        checkpoint = self.read_checkpoint() if options['resume'] else {'rows': 0, 'members': [], 'tasks': [], 'regs': []}
+        skip = checkpoint['rows']
+
+        # reg_number -> (id, email), loaded once instead of one lookup per row
+        self.members = {
+            reg_number: (pk, email)
+            for pk, reg_number, email in Member.objects.values_list('pk', 'reg_number', 'email').iterator(chunk_size=5000)
+        }
+        self.owners = {email: reg_number for reg_number, (_, email) in self.members.items()}
+        self.regs_by_id = {pk: reg_number for reg_number, (pk, _) in self.members.items()}
+        self.explicit_task_ids = False
+        # Carried over from the checkpoint, as the batches it covers are already
+        # committed but their derived rows are only updated at the end.
+        # Checkpoints from before these were saved only record 'rows'.
+        self.touched_regs = set(checkpoint['regs'] if 'regs' in checkpoint else self.members)
+        # None once past FULL_REBUILD_AT
+        self.touched_members = self.restore(checkpoint, 'members')
+        self.touched_tasks = self.restore(checkpoint, 'tasks')
+        self.kind = options['kind']
+
+        started = time.perf_counter()
+        done = skip
+        imported = rejected = 0
+        upsert = self.upsert_members if options['kind'] == 'members' else self.upsert_tasks
+
+        with open(path, newline='', encoding='utf-8') as fh:
+            records = self.read_records(fh, fmt)
+            for _ in range(skip):
+                next(records, None)
+            if skip:
+                self.stdout.write(f'Resuming after row {skip}.')
+
+            with explicit_timestamps(Task):
+                for batch in chunked(records, options['batch_size']):
+                    valid = []
+                    # Emails claimed by earlier rows of this batch, not yet in self.owners
+                    self.batch_owners = {}
+                    for number, record in enumerate(batch, start=done + 1):
+                        try:
+                            valid.append(self.clean(options['kind'], record))
+                        except (ValidationError, ValueError) as exc:
+                            rejected += 1
+                            self.stderr.write(f'Row {number}: {self.describe(exc)}')
+                    with transaction.atomic():
+                        upsert(valid)
+                    done += len(batch)
+                    imported += len(valid)
+                    self.write_checkpoint(done)
+
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(f'  {done} rows read, {imported} imported ({imported / elapsed:,.0f} rows/sec)')
+
+        if self.explicit_task_ids:
+            # Rows inserted with their own ids don't advance PostgreSQL's sequence
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [Task]):
+                    cursor.execute(sql)
+
+        self.update_derived()
+        cache.invalidate(
+            cache.DASHBOARD, cache.MEMBER_LIST, cache.LEADERBOARD, cache.RANKING,
+            *(cache.member_group(reg) for reg in self.touched_regs),
+        )
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            # Empty or header-only files never write one
+            pass
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} {options["kind"]} ({rejected} rejected) in {elapsed:.1f}s '
+            f'({imported / elapsed if elapsed else 0:,.0f} rows/sec).'
+        ))
+
+    def update_derived(self):
+        """Bring what the upserts' skipped signals maintain up to date for the touched rows"""
+        members, tasks = self.touched_members, self.touched_tasks
+        if members is None:
+            LeaderboardEntry.objects.rebuild()
+        else:
+            for pk in members:
+                if LeaderboardEntry.objects.sync_member(pk) is None:
+                    LeaderboardEntry.objects.add_member(Member.objects.get(pk=pk))
+
+        if self.kind == 'members':
+            # Tasks index their member's name and reg number
+            if members is None:
+                search.rebuild()
+            else:
+                search.index_members(sorted(members), with_tasks=True)
+            return
+        TaskRollup.objects.rebuild(members=members)
+        if tasks is None:
+            search.rebuild()
+        else:
+            search.index_tasks(sorted(tasks))
+
+    def touch(self, attr, ids):
+        touched = getattr(self, attr)
+        if touched is None:
+            return
+        touched.update(ids)
+        if len(touched) > FULL_REBUILD_AT:
+            setattr(self, attr, None)
+
+    def read_records(self, fh, fmt):
+        if fmt == 'csv':
+            # export_tracker quotes cells that look like formulas
+            for record in csv.DictReader(fh):
+                yield {field: unescape_cell(value) for field, value in record.items()}
+            return
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+    def read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            raise CommandError(f'No checkpoint found at {self.checkpoint_path}')
+
+    def restore(self, checkpoint, key):
+        touched = checkpoint.get(key)
+        # A missing key means the previous run didn't record it: rebuild everything
+        return None if touched is None else set(touched)
+
+    def write_checkpoint(self, rows):
+        tmp = f'{self.checkpoint_path}.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump({
+                'rows': rows,
+                'members': None if self.touched_members is None else sorted(self.touched_members),
+                'tasks': None if self.touched_tasks is None else sorted(self.touched_tasks),
+                'regs': sorted(self.touched_regs),
+            }, fh)
+        os.replace(tmp, self.checkpoint_path)
+
+    def describe(self, exc):
+        if isinstance(exc, ValidationError) and hasattr(exc, 'message_dict'):
+            return '; '.join(f'{field}: {" ".join(errors)}' for field, errors in exc.message_dict.items())
+        return ' '.join(exc.messages) if isinstance(exc, ValidationError) else str(exc)
+
+    def clean(self, kind, record):
+        if kind == 'members':
+            member = Member(**{field: (record.get(field) or '').strip() for field in MEMBER_FIELDS})
+            member.clean_fields(exclude={'total_credits', 'total_tasks', 'completed_tasks'})
+            for owners in (self.batch_owners, self.owners):
+                owner = owners.get(member.email)
+                if owner is not None and owner != member.reg_number:
+                    raise ValueError(f'email {member.email} already belongs to {owner}')
+            self.batch_owners[member.email] = member.reg_number
+            return member
+
+        reg_number = (record.get('member') or '').strip()
+        if reg_number not in self.members:
+            raise ValueError(f'unknown member {reg_number!r}')
+        values = {field: record[field] for field in TASK_FIELDS if record.get(field) not in (None, '')}
+        completed = values.get('is_completed')
+        if isinstance(completed, str) and completed.strip().lower() in BOOLEANS:
+            values['is_completed'] = BOOLEANS[completed.strip().lower()]
+        task = Task(member_id=self.members[reg_number][0], **values)
+        if record.get('id') not in (None, ''):
+            task.pk = int(record['id'])
+        task.clean_fields(exclude={'member', 'updated_at'})
+        for field in ('created_at', 'completed_at', 'due_date'):
+            moment = getattr(task, field)
+            if moment is not None and timezone.is_naive(moment):
+                setattr(task, field, timezone.make_aware(moment))
+        task.created_at = task.created_at or timezone.now()
+        task.updated_at = timezone.now()
+        task.completed_at = (task.completed_at or task.updated_at) if task.is_completed else None
+        return task
+
+    def upsert_members(self, members):
+        # Last row wins when a reg_number repeats inside one batch
+        members = list({member.reg_number: member for member in members}.values())
+        Member.objects.bulk_create(
+            members,
+            update_conflicts=True,
+            unique_fields=['reg_number'],
+            update_fields=['name', 'email', 'updated_at'],
+        )
+        for member in members:
+            previous = self.members.get(member.reg_number)
+            if previous is not None and previous[1] != member.email:
+                self.owners.pop(previous[1], None)
+            self.members[member.reg_number] = (member.pk, member.email)
+            self.regs_by_id[member.pk] = member.reg_number
+            self.owners[member.email] = member.reg_number
+            self.touched_regs.add(member.reg_number)
+        self.touch('touched_members', (member.pk for member in members))
+
+    def upsert_tasks(self, tasks):
+        tasks = list({task.pk or id(task): task for task in tasks}.values())
+        existing_ids = [task.pk for task in tasks if task.pk is not None]
+        # (member_id, credits, is_completed) before the upsert, to log what changed
+        previous = {
+            pk: tuple(state) for pk, *state in
+            Task.objects.filter(pk__in=existing_ids).values_list('pk', 'member_id', 'credits', 'is_completed')
+        }
+        # Members losing a task to a reassignment need recounting too
+        affected = {member_id for member_id, _, _ in previous.values()}
+        affected.update(task.member_id for task in tasks)
+
+        Task.objects.bulk_create(
+            tasks,
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=['member', *TASK_FIELDS, 'updated_at'],
+        )
+        TaskEvent.objects.append([
+            event for task in tasks
+            for event in TaskEvent.for_change(task, previous.get(task.pk))
+        ])
+        Member.objects.filter(pk__in=affected).recount_counters()
+        self.touched_regs.update(self.regs_by_id[pk] for pk in affected if pk in self.regs_by_id)
+        self.touch('touched_members', affected)
+        self.touch('touched_tasks', (task.pk for task in tasks))
+        self.explicit_task_ids = self.explicit_task_ids or bool(existing_ids)
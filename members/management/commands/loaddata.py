@@ -0,0 +1,29 @@
+from django.core.management.commands import loaddata
+from django.db import transaction
+from members import cache, search
+from members.models import LeaderboardEntry, Member, TaskEvent, TaskRollup
+
+
+class Command(loaddata.Command):
+    help = (
+        f'{loaddata.Command.help} Fixture rows skip the tracker signals, so the member '
+        'counters, leaderboard, rollups and search index are rebuilt afterwards.'
+    )
+
+    def loaddata(self, fixture_labels):
+        super().loaddata(fixture_labels)
+        if not self.loaded_object_count:
+            return
+        # Still inside handle()'s transaction, so this commits with the fixtures
+        Member.objects.recount_counters()
+        LeaderboardEntry.objects.rebuild()
+        TaskRollup.objects.rebuild()
+        search.rebuild()
+        # The fixture's tasks never made it into the event log
+        TaskEvent.objects.append([TaskEvent(kind=TaskEvent.RESET, task_id=0, member_id=0, credits=0)])
+        transaction.on_commit(
+            lambda: cache.invalidate(cache.DASHBOARD, cache.MEMBER_LIST, cache.LEADERBOARD, cache.RANKING),
+            robust=True,
+        )
+        if self.verbosity >= 1:
+            self.stdout.write('Rebuilt the member counters, leaderboard, rollups and search index.')
@@ -0,0 +1,266 @@
+import http.client
+import importlib.util
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from members.management.commands.benchmark_views import percentile
+from members.models import LeaderboardEntry, Member
+
+WORKER_CLASSES = {
+    'sync': ('sync', 'falcon.wsgi:application'),
+    'gthread': ('gthread', 'falcon.wsgi:application'),
+    'uvicorn': (None, 'falcon.asgi:application'),
+}
+
+DEFAULT_MIX = 'dashboard=2,leaderboard=3,member_detail=5'
+
+
+def uvicorn_worker_class():
+    """The gunicorn worker class for uvicorn, or None when uvicorn isn't installed"""
+    if importlib.util.find_spec('uvicorn_worker'):
+        return 'uvicorn_worker.UvicornWorker'
+    if importlib.util.find_spec('uvicorn'):
+        return 'uvicorn.workers.UvicornWorker'
+    return None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Boot the app under gunicorn with a chosen worker model and drive a weighted mix of '
+        'dashboard, leaderboard and member detail requests from concurrent keep-alive clients. '
+        'Reports throughput and latency percentiles so worker settings can be chosen from numbers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--worker-class', choices=sorted(WORKER_CLASSES), default='sync')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() * 2 + 1, help='Gunicorn workers (default: 2n+1)')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gthread worker (default: 4)')
+        parser.add_argument('--keepalive', type=int, default=2, help='Gunicorn keep-alive seconds (default: 2)')
+        parser.add_argument('--clients', type=int, default=16, help='Concurrent clients (default: 16)')
+        parser.add_argument('--duration', type=float, default=20, help='Seconds of measured load (default: 20)')
+        parser.add_argument('--warmup', type=float, default=3, help='Seconds of unmeasured load first (default: 3)')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Weighted request mix (default: {DEFAULT_MIX})')
+        parser.add_argument('--url', help='Load an already running server at this base URL instead of booting gunicorn')
+        parser.add_argument('--seed', type=int, help='Random seed for the request sequence')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix'])
+        paths = self.paths_for(mix)
+        server = None
+        if options['url']:
+            host, port = self.parse_url(options['url'])
+        else:
+            host, port = '127.0.0.1', free_port()
+            server = self.start_server(port, options)
+        try:
+            self.wait_until_ready(host, port, server)
+            self.stdout.write(f'Warming up for {options["warmup"]:g}s...')
+            self.run_load(host, port, paths, mix, options, options['warmup'])
+            self.stdout.write(f'Measuring {options["clients"]} clients for {options["duration"]:g}s...')
+            samples, errors, elapsed = self.run_load(host, port, paths, mix, options, options['duration'])
+        finally:
+            if server:
+                self.stop_server(server)
+
+        results = self.summarise(samples, errors, elapsed, options)
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def parse_mix(self, value):
+        mix = {}
+        for part in value.split(','):
+            name, _, weight = part.partition('=')
+            if name not in ('dashboard', 'leaderboard', 'member_detail', 'member_list'):
+                raise CommandError(f'Unknown view in --mix: {name!r}')
+            try:
+                mix[name] = int(weight or 1)
+            except ValueError:
+                raise CommandError(f'Bad weight in --mix: {part!r}')
+        return mix
+
+    def parse_url(self, url):
+        if not url.startswith('http://'):
+            raise CommandError('--url must be a plain http:// URL')
+        host, _, port = url[len('http://'):].rstrip('/').partition(':')
+        return host, int(port or 80)
+
+    def paths_for(self, mix):
+        """Concrete URLs per view; detail and leaderboard spread over many members and pages"""
+        paths = {name: [reverse(f'members:{name}')] for name in mix if name != 'member_detail'}
+        if 'member_detail' in mix:
+            regs = list(Member.objects.order_by('-total_credits').values_list('reg_number', flat=True)[:500])
+            if not regs:
+                raise CommandError('No members to load test against; run create_sample_data first.')
+            paths['member_detail'] = [reverse('members:member_detail', args=[reg]) for reg in regs]
+        if 'leaderboard' in mix:
+            base = reverse('members:leaderboard')
+            # Keyset cursors for the first ten pages
+            cursors = LeaderboardEntry.objects.ranked().values_list('credits', 'member_id')
+            paths['leaderboard'] += [
+                f'{base}?after={credits}.{member_id}'
+                for credits, member_id in (cursors[offset] for offset in range(49, min(cursors.count(), 500) - 1, 50))
+            ]
+        return paths
+
+    def start_server(self, port, options):
+        worker_class, app = WORKER_CLASSES[options['worker_class']]
+        if options['worker_class'] == 'uvicorn':
+            worker_class = uvicorn_worker_class()
+            if worker_class is None:
+                raise CommandError('The uvicorn worker needs uvicorn installed (pip install uvicorn-worker).')
+        env = {
+            **os.environ,
+            'GUNICORN_BIND': f'127.0.0.1:{port}',
+            'GUNICORN_WORKERS': str(options['workers']),
+            'GUNICORN_WORKER_CLASS': worker_class,
+            'GUNICORN_THREADS': str(options['threads'] if options['worker_class'] == 'gthread' else 1),
+            'GUNICORN_KEEPALIVE': str(options['keepalive']),
+            'GUNICORN_ACCESSLOG': '',
+            'GUNICORN_LOGLEVEL': 'warning',
+            'GUNICORN_PIDFILE': '',
+            'GUNICORN_MAX_REQUESTS': '0',
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'falcon.settings'),
+        }
+        self.stdout.write(
+            f'Starting gunicorn ({worker_class}, {options["workers"]} workers'
+            + (f', {options["threads"]} threads' if options['worker_class'] == 'gthread' else '')
+            + f') on port {port}...'
+        )
+        return subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', str(settings.BASE_DIR / 'gunicorn_config.py'), app],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL,
+        )
+
+    def wait_until_ready(self, host, port, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server and server.poll() is not None:
+                raise CommandError(f'gunicorn exited with status {server.returncode}')
+            try:
+                conn = http.client.HTTPConnection(host, port, timeout=5)
+                conn.request('GET', reverse('members:dashboard'))
+                conn.getresponse().read()
+                conn.close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'Server at {host}:{port} did not respond within {timeout}s')
+
+    def stop_server(self, server):
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+    def run_load(self, host, port, paths, mix, options, duration):
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        samples = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def client(index):
+            rng = random.Random(None if options['seed'] is None else options['seed'] + index)
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            local_samples = defaultdict(list)
+            local_errors = defaultdict(int)
+            while time.monotonic() < deadline:
+                name = rng.choices(names, weights)[0]
+                path = rng.choice(paths[name])
+                start = time.perf_counter()
+                try:
+                    conn.request('GET', path)
+                    response = conn.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    local_errors[name] += 1
+                    conn.close()
+                    conn = http.client.HTTPConnection(host, port, timeout=30)
+                    continue
+                latency = (time.perf_counter() - start) * 1000
+                if response.status >= 400:
+                    local_errors[name] += 1
+                else:
+                    local_samples[name].append(latency)
+            conn.close()
+            with lock:
+                for name, values in local_samples.items():
+                    samples[name].extend(values)
+                for name, count in local_errors.items():
+                    errors[name] += count
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(options['clients'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, errors, time.perf_counter() - started
+
+    def latency_summary(self, values):
+        values = sorted(values)
+        if not values:
+            return {'requests': 0}
+        return {
+            'requests': len(values),
+            'p50_ms': round(percentile(values, 50), 2),
+            'p95_ms': round(percentile(values, 95), 2),
+            'p99_ms': round(percentile(values, 99), 2),
+        }
+
+    def summarise(self, samples, errors, elapsed, options):
+        all_values = [value for values in samples.values() for value in values]
+        return {
+            'worker_class': options['worker_class'],
+            'workers': options['workers'],
+            'threads': options['threads'] if options['worker_class'] == 'gthread' else 1,
+            'clients': options['clients'],
+            'duration_s': round(elapsed, 2),
+            'throughput_rps': round(len(all_values) / elapsed, 1) if elapsed else 0,
+            'errors': sum(errors.values()),
+            'overall': self.latency_summary(all_values),
+            'views': {
+                name: {**self.latency_summary(values), 'errors': errors.get(name, 0)}
+                for name, values in sorted(samples.items())
+            },
+        }
+
+    def report(self, results):
+        overall = results['overall']
+        self.stdout.write(
+            f"{results['throughput_rps']} req/s over {results['duration_s']}s, "
+            f"{overall['requests']} ok, {results['errors']} errors"
+        )
+        rows = [('overall', overall)] + list(results['views'].items())
+        for name, stats in rows:
+            if not stats['requests']:
+                self.stdout.write(f'  {name:<14} no successful requests')
+                continue
+            self.stdout.write(
+                f"  {name:<14} {stats['requests']:>7}  p50 {stats['p50_ms']:>8.1f} ms  "
+                f"p95 {stats['p95_ms']:>8.1f} ms  p99 {stats['p99_ms']:>8.1f} ms"
+            )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from members.models import LeaderboardEntry
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized leaderboard from the stored member counters'
+
+    def handle(self, *args, **options):
+        count = LeaderboardEntry.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Ranked {count} members.'))
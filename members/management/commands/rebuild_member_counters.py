@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Q
+from members.models import LeaderboardEntry, Member
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the denormalized credit/task counters stored on each member'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only report members whose stored counters disagree with their tasks',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            with transaction.atomic():
+                updated = Member.objects.recount_counters()
+                LeaderboardEntry.objects.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt counters and ranks for {updated} members.'))
+
+        mismatched = Member.objects.with_actual_counters().filter(
+            ~Q(total_credits=F('actual_credits'))
+            | ~Q(total_tasks=F('actual_tasks'))
+            | ~Q(completed_tasks=F('actual_completed'))
+        ).order_by('reg_number')
+
+        count = 0
+        for member in mismatched.iterator():
+            count += 1
+            self.stdout.write(
+                f'{member.reg_number}: credits {member.total_credits} != {member.actual_credits}, '
+                f'tasks {member.total_tasks} != {member.actual_tasks}, '
+                f'completed {member.completed_tasks} != {member.actual_completed}'
+            )
+
+        if count:
+            raise CommandError(f'{count} members have counters that do not match their tasks.')
+        self.stdout.write(self.style.SUCCESS('All member counters match their tasks.'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from members.models import TaskRollup
+
+
+class Command(BaseCommand):
+    help = 'Backfill the daily and weekly task rollups from the task table'
+
+    def handle(self, *args, **options):
+        count = TaskRollup.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} rollup rows.'))
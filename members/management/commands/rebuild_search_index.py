@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from members import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index over members and tasks'
+
+    def handle(self, *args, **options):
+        if search.index_for(connection) is None:
+            self.stdout.write(f'No search index on {connection.vendor}; searches use LIKE lookups.')
+            return
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Rebuilt the search index.'))
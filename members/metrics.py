@@ -0,0 +1,214 @@
+"""
+Prometheus metrics shared across gunicorn workers.
+
+Each worker process accumulates counters in memory and every few seconds adds
+the deltas to a small SQLite file (``METRICS_DB``) with an upsert, so the
+totals survive worker restarts (``max_requests``) and ``/metrics`` served by
+any worker reports the sum over all of them. Only the standard library is
+used; no Prometheus client or external service is required. The page cache
+(members.cache) keeps its hit and miss counters here too.
+"""
+
+import atexit
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help)
+METRICS = {
+    'falcon_http_requests_total': ('counter', 'HTTP requests by URL name, method and status.'),
+    'falcon_http_request_duration_seconds': ('histogram', 'Request latency by URL name.'),
+    'falcon_http_response_bytes_total': ('counter', 'Response body bytes by URL name.'),
+    'falcon_db_queries_total': ('counter', 'SQL queries by URL name.'),
+    'falcon_db_query_duration_seconds_total': ('counter', 'Time spent in SQL by URL name.'),
+    'falcon_template_render_seconds_total': ('counter', 'Time spent rendering templates by URL name.'),
+    'falcon_page_cache_hits_total': ('counter', 'Tracker page cache hits.'),
+    'falcon_page_cache_misses_total': ('counter', 'Tracker page cache misses.'),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels)
+)
+"""
+
+
+def _labels(**labels):
+    return ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+class MetricsStore:
+    def __init__(self, path, flush_interval):
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.pid = None
+        self.pending = defaultdict(float)
+        self.last_flush = time.monotonic()
+        self.initialized = False
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        if not self.initialized:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(SCHEMA)
+            self.initialized = True
+        return connection
+
+    def _check_fork(self):
+        # Under preload_app the store may have been created before fork
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.pending.clear()
+            self.last_flush = time.monotonic()
+
+    def observe_request(self, view, method, status, stats):
+        seconds = stats.total_ms / 1000
+        with self.lock:
+            self._check_fork()
+            pending = self.pending
+            pending['falcon_http_requests_total', _labels(view=view, method=method, status=status)] += 1
+            for bucket in DURATION_BUCKETS:
+                if seconds <= bucket:
+                    pending['falcon_http_request_duration_seconds_bucket', _labels(view=view, le=bucket)] += 1
+            pending['falcon_http_request_duration_seconds_bucket', _labels(view=view, le='+Inf')] += 1
+            pending['falcon_http_request_duration_seconds_sum', _labels(view=view)] += seconds
+            pending['falcon_http_request_duration_seconds_count', _labels(view=view)] += 1
+            pending['falcon_http_response_bytes_total', _labels(view=view)] += stats.response_bytes or 0
+            pending['falcon_db_queries_total', _labels(view=view)] += stats.queries
+            pending['falcon_db_query_duration_seconds_total', _labels(view=view)] += stats.sql_ms / 1000
+            pending['falcon_template_render_seconds_total', _labels(view=view)] += stats.template_ms / 1000
+            due = time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self._check_fork()
+            self.pending[name, ''] += amount
+            due = time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def totals(self, *names):
+        """Return ``{name: value}`` summed over every worker and label set"""
+        values = dict.fromkeys(names, 0)
+        for name, _, value in self.samples():
+            if name in values:
+                values[name] += value
+        return values
+
+    def reset(self, *names):
+        with self.lock:
+            self._check_fork()
+            for key in [key for key in self.pending if key[0] in names]:
+                del self.pending[key]
+        try:
+            with self._connect() as connection:
+                connection.execute(f'DELETE FROM samples WHERE name IN ({", ".join("?" * len(names))})', names)
+            connection.close()
+        except sqlite3.Error:
+            pass
+
+    def flush(self):
+        with self.lock:
+            self._check_fork()
+            if not self.pending:
+                return
+            rows = [(name, labels, value) for (name, labels), value in self.pending.items()]
+            self.pending.clear()
+            self.last_flush = time.monotonic()
+        try:
+            with self._connect() as connection:
+                connection.executemany(
+                    'INSERT INTO samples (name, labels, value) VALUES (?, ?, ?) '
+                    'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                    rows,
+                )
+            connection.close()
+        except sqlite3.Error:
+            # Keep the deltas for the next attempt rather than losing them
+            with self.lock:
+                for name, labels, value in rows:
+                    self.pending[name, labels] += value
+
+    def samples(self):
+        self.flush()
+        try:
+            connection = self._connect()
+            try:
+                return connection.execute('SELECT name, labels, value FROM samples ORDER BY name, labels').fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            return []
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    path = str(getattr(settings, 'METRICS_DB', settings.BASE_DIR / 'metrics.sqlite3'))
+    if _store is None or _store.path != path:
+        if _store is not None:
+            _store.flush()
+        _store = MetricsStore(path, getattr(settings, 'METRICS_FLUSH_INTERVAL', 5))
+        atexit.register(_store.flush)
+    return _store
+
+
+def observe_request(request, response, stats):
+    match = request.resolver_match
+    view = match.view_name if match else 'unresolved'
+    get_store().observe_request(view, request.method, response.status_code, stats)
+
+
+_LE_LABEL = re.compile(r',?le="([^"]*)"$')
+
+
+def _sample_order(sample):
+    """Sort key putting a histogram's buckets in numeric order, ``+Inf`` last"""
+    name, labels, _ = sample
+    match = _LE_LABEL.search(labels)
+    if match is None:
+        return name, labels, 0.0
+    return name, labels[:match.start()], float(match.group(1))
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render():
+    """Render every metric in the Prometheus text exposition format"""
+    by_family = defaultdict(list)
+    for name, labels, value in sorted(get_store().samples(), key=_sample_order):
+        family = name
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+                family = name[:-len(suffix)]
+        by_family[family].append((name, labels, value))
+
+    lines = []
+    for family, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        for name, labels, value in by_family.get(family, []):
+            series = f'{name}{{{labels}}}' if labels else name
+            lines.append(f'{series} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,168 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import instrumentation, metrics, routers
+
+logger = logging.getLogger('members.performance')
+
+
+def get_budget(view_name):
+    """Return the ``{'queries': n, 'ms': t}`` budget configured for a URL name"""
+    budgets = getattr(settings, 'PERFORMANCE_BUDGETS', {})
+    return budgets.get(view_name, budgets.get('default', {}))
+
+
+class RequestMetricsMiddleware:
+    """Measure SQL, template and total time per request.
+
+    Adds a ``Server-Timing`` header and logs a warning for requests that go
+    over the budget configured for their URL name in ``PERFORMANCE_BUDGETS``.
+    Keep it first in ``MIDDLEWARE`` so the total covers the whole stack.
+    Works in both sync and async stacks, so ASGI requests don't pay for a
+    thread hop at the outermost layer.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = instrumentation.start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.finish_request(token)
+        self.process_stats(request, response, stats, start)
+        if getattr(settings, 'METRICS_ENABLED', True):
+            metrics.observe_request(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = instrumentation.start_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.finish_request(token)
+        self.process_stats(request, response, stats, start)
+        if getattr(settings, 'METRICS_ENABLED', True):
+            # A due flush writes to the metrics SQLite file; keep it off the event loop
+            await sync_to_async(metrics.observe_request, thread_sensitive=False)(request, response, stats)
+        return response
+
+    def process_stats(self, request, response, stats, start):
+        stats.total_ms = (time.perf_counter() - start) * 1000
+        if not response.streaming:
+            stats.response_bytes = len(response.content)
+
+        request.performance = stats
+        if getattr(settings, 'PERFORMANCE_SERVER_TIMING', True):
+            response['Server-Timing'] = (
+                f'db;dur={stats.sql_ms:.1f};desc="{stats.queries} queries", '
+                f'tpl;dur={stats.template_ms:.1f}, '
+                f'total;dur={stats.total_ms:.1f}'
+            )
+        self.check_budget(request, stats)
+
+    def check_budget(self, request, stats):
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        budget = get_budget(view_name)
+        over = []
+        if 'queries' in budget and stats.queries > budget['queries']:
+            over.append(f"{stats.queries} queries (budget {budget['queries']})")
+        if 'ms' in budget and stats.total_ms > budget['ms']:
+            over.append(f"{stats.total_ms:.0f} ms (budget {budget['ms']} ms)")
+        if over:
+            logger.warning(
+                '%s %s [%s] over budget: %s; sql %.1f ms, template %.1f ms, %s bytes',
+                request.method, request.get_full_path(), view_name, ', '.join(over),
+                stats.sql_ms, stats.template_ms, stats.response_bytes,
+            )
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise that stays on the event loop under ASGI.
+
+    The stock middleware is sync only, which makes Django run everything
+    below it through a thread. Without autorefresh the file lookup is a dict
+    read, so only the autorefresh lookup needs a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class ReadReplicaMiddleware:
+    """Serve safe requests to the tracker pages, API and exports from a read replica.
+
+    See members.routers. Does nothing unless ``DATABASE_REPLICAS`` is set.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        alias = routers.replica_for(request)
+        token = routers.pin(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.unpin(token)
+        return self.process_response(request, response, alias)
+
+    async def __acall__(self, request):
+        alias = routers.replica_for(request)
+        token = routers.pin(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.unpin(token)
+        return self.process_response(request, response, alias)
+
+    def process_response(self, request, response, alias):
+        if alias is not None and response.streaming and not response.is_async:
+            response.streaming_content = routers.pinned_stream(response.streaming_content, alias)
+        if settings.DATABASE_REPLICAS and request.method not in routers.SAFE_METHODS:
+            response.set_cookie(
+                routers.STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Member = apps.get_model('members', 'Member')
+    Task = apps.get_model('members', 'Task')
+    tasks = Task.objects.filter(member=OuterRef('pk')).order_by().values('member')
+    completed = tasks.filter(is_completed=True)
+    Member.objects.update(
+        total_credits=Coalesce(Subquery(completed.annotate(n=Sum('credits')).values('n')), Value(0)),
+        total_tasks=Coalesce(Subquery(tasks.annotate(n=Count('pk')).values('n')), Value(0)),
+        completed_tasks=Coalesce(Subquery(completed.annotate(n=Count('pk')).values('n')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='completed_tasks',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='total_credits',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='total_tasks',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['-total_credits', 'name'], name='member_credits_rank_idx'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import Rank
+
+
+def populate_leaderboard(apps, schema_editor):
+    Member = apps.get_model('members', 'Member')
+    LeaderboardEntry = apps.get_model('members', 'LeaderboardEntry')
+    members = Member.objects.annotate(
+        rank=Window(Rank(), order_by=F('total_credits').desc()),
+    ).values_list('pk', 'total_credits', 'total_tasks', 'completed_tasks', 'rank')
+    LeaderboardEntry.objects.bulk_create(
+        (
+            LeaderboardEntry(
+                member_id=pk,
+                credits=credits,
+                total_tasks=total,
+                completed_tasks=completed,
+                completion_rate=completed / total * 100 if total else 0,
+                rank=rank,
+            )
+            for pk, credits, total, completed, rank in members.iterator(chunk_size=2000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0002_member_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('member', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='leaderboard_entry', serialize=False, to='members.member')),
+                ('credits', models.PositiveIntegerField(default=0)),
+                ('rank', models.PositiveIntegerField(default=1)),
+                ('total_tasks', models.PositiveIntegerField(default=0)),
+                ('completed_tasks', models.PositiveIntegerField(default=0)),
+                ('completion_rate', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'leaderboard entries',
+                'indexes': [models.Index(fields=['rank', 'member'], name='leaderboard_rank_idx'), models.Index(fields=['credits'], name='leaderboard_credits_idx')],
+            },
+        ),
+        migrations.RunPython(populate_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0003_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='task',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['-created_at'], name='member_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['member', 'created_at', 'id'], name='task_member_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['-created_at'], name='task_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_completed', True)), fields=['member', 'credits'], name='task_completed_credits_idx'),
+        ),
+    ]
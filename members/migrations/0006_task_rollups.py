@@ -0,0 +1,90 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:59
+
+import heapq
+from datetime import datetime
+from itertools import groupby, islice
+from operator import itemgetter
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate, TruncWeek
+from django.utils import timezone
+
+# A frozen copy of members.bulk.rollup_rows as of this migration, so later
+# changes to the app code don't change what the backfill does.
+
+
+def _grouped(tasks, field, trunc):
+    rows = (
+        tasks.order_by()
+        .annotate(bucket=trunc(field, tzinfo=timezone.get_current_timezone()))
+        .values('bucket', 'member_id')
+        .annotate(n=Count('pk'), credits=Coalesce(Sum('credits'), Value(0)))
+        .order_by('bucket', 'member_id')
+        .values_list('bucket', 'member_id', 'n', 'credits')
+    )
+    for bucket, member_id, n, credits in rows.iterator(chunk_size=2000):
+        if isinstance(bucket, datetime):
+            bucket = bucket.date()
+        yield (bucket, member_id), n, credits
+
+
+def _rollup_rows(tasks):
+    # Tasks have no completed_at yet; updated_at is the closest stand-in
+    for period, trunc in (('day', TruncDate), ('week', TruncWeek)):
+        streams = (
+            ((key, (0, n, 0)) for key, n, _ in _grouped(tasks, 'created_at', trunc)),
+            ((key, (credits, 0, n)) for key, n, credits in _grouped(tasks.filter(is_completed=True), 'updated_at', trunc)),
+        )
+        current, overall = None, [0, 0, 0]
+        for (bucket, member_id), group in groupby(heapq.merge(*streams, key=itemgetter(0)), key=itemgetter(0)):
+            totals = [sum(column) for column in zip(*(values for _, values in group))]
+            if bucket != current:
+                if current is not None:
+                    yield (period, current, None, *overall)
+                current, overall = bucket, [0, 0, 0]
+            overall = [a + b for a, b in zip(overall, totals)]
+            yield (period, bucket, member_id, *totals)
+        if current is not None:
+            yield (period, current, None, *overall)
+
+
+def populate_rollups(apps, schema_editor):
+    Task = apps.get_model('members', 'Task')
+    TaskRollup = apps.get_model('members', 'TaskRollup')
+    rows = (
+        TaskRollup(
+            period=period, start=start, member_id=owner,
+            credits_earned=credits, tasks_created=created, tasks_completed=completed,
+        )
+        for period, start, owner, credits, created, completed in _rollup_rows(Task.objects.all())
+    )
+    while batch := list(islice(rows, 1000)):
+        TaskRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0005_live_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week')], max_length=4)),
+                ('start', models.DateField()),
+                ('credits_earned', models.IntegerField(default=0)),
+                ('tasks_created', models.IntegerField(default=0)),
+                ('tasks_completed', models.IntegerField(default=0)),
+                ('member', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='rollups', to='members.member')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('member', 'period', 'start'), name='rollup_member_bucket_unique'), models.UniqueConstraint(condition=models.Q(('member__isnull', True)), fields=('period', 'start'), name='rollup_global_bucket_unique')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
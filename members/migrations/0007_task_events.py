@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:02
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_completed_at(apps, schema_editor):
+    # The last update is the best record of when existing tasks were completed
+    Task = apps.get_model('members', 'Task')
+    Task.objects.filter(is_completed=True).update(completed_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0006_task_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskEvent',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('created', 'Created'), ('completed', 'Completed'), ('reopened', 'Reopened'), ('credits_changed', 'Credits changed'), ('reassigned', 'Reassigned'), ('deleted', 'Deleted')], max_length=16)),
+                ('task_id', models.BigIntegerField()),
+                ('member_id', models.BigIntegerField()),
+                ('credits', models.PositiveIntegerField()),
+                ('previous_member_id', models.BigIntegerField(blank=True, null=True)),
+                ('previous_credits', models.PositiveIntegerField(blank=True, null=True)),
+                ('at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+    ]
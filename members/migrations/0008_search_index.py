@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:41
+
+from django.db import migrations
+
+# The index as members.search defined it when this migration was written,
+# kept here so later changes to the app code don't change what it does.
+# Row ids: task id * 2, member id * 2 + 1.
+SQL = {
+    'sqlite': {
+        'create': [
+            "CREATE VIRTUAL TABLE members_search USING fts5("
+            "title, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+            "INSERT INTO members_search (rowid, title, body) "
+            "SELECT t.id * 2, t.title, COALESCE(t.description, '') || ' ' || m.name || ' ' || m.reg_number "
+            "FROM members_task t JOIN members_member m ON m.id = t.member_id",
+            "INSERT INTO members_search (rowid, title, body) "
+            "SELECT m.id * 2 + 1, m.name, m.reg_number || ' ' || m.email FROM members_member m",
+        ],
+        'drop': ['DROP TABLE IF EXISTS members_search'],
+    },
+    'postgresql': {
+        'create': [
+            'CREATE TABLE members_search (id bigint PRIMARY KEY, document tsvector NOT NULL)',
+            'CREATE INDEX members_search_document ON members_search USING GIN (document)',
+            "INSERT INTO members_search (id, document) "
+            "SELECT t.id * 2, setweight(to_tsvector('simple', t.title), 'A') || setweight(to_tsvector('simple', "
+            "COALESCE(t.description, '') || ' ' || m.name || ' ' || m.reg_number), 'B') "
+            "FROM members_task t JOIN members_member m ON m.id = t.member_id",
+            "INSERT INTO members_search (id, document) "
+            "SELECT m.id * 2 + 1, setweight(to_tsvector('simple', m.name), 'A') || setweight(to_tsvector('simple', "
+            "m.reg_number || ' ' || m.email), 'B') FROM members_member m",
+        ],
+        'drop': ['DROP TABLE IF EXISTS members_search'],
+    },
+}
+
+
+def _run(schema_editor, action):
+    # Other databases have no index; members.search falls back to icontains
+    for sql in SQL.get(schema_editor.connection.vendor, {}).get(action, []):
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, 'create')
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, 'drop')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0007_task_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='taskevent',
+            name='kind',
+            field=models.CharField(choices=[('created', 'Created'), ('completed', 'Completed'), ('reopened', 'Reopened'), ('credits_changed', 'Credits changed'), ('reassigned', 'Reassigned'), ('deleted', 'Deleted'), ('reset', 'Reset')], max_length=16),
+        ),
+    ]
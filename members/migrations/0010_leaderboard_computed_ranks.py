@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0009_taskevent_reset'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='leaderboardentry',
+            name='leaderboard_rank_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='leaderboardentry',
+            name='leaderboard_credits_idx',
+        ),
+        migrations.RemoveField(
+            model_name='leaderboardentry',
+            name='rank',
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['-credits', 'member'], name='leaderboard_order_idx'),
+        ),
+    ]
@@ -1,4 +1,45 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum, Count, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .bulk import chunked, rollup_rows
+
+
+class MemberQuerySet(models.QuerySet):
+    def adjust_counters(self, credits=0, tasks=0, completed=0):
+        """Apply counter deltas with F-expressions so concurrent writers don't race"""
+        changes = {}
+        if credits:
+            changes['total_credits'] = F('total_credits') + credits
+        if tasks:
+            changes['total_tasks'] = F('total_tasks') + tasks
+        if completed:
+            changes['completed_tasks'] = F('completed_tasks') + completed
+        if not changes:
+            return 0
+        return self.update(**changes)
+
+    def with_actual_counters(self):
+        """Annotate the counters as recomputed from the task table"""
+        return self.annotate(
+            actual_credits=Coalesce(Sum('tasks__credits', filter=Q(tasks__is_completed=True)), Value(0)),
+            actual_tasks=Count('tasks'),
+            actual_completed=Count('tasks', filter=Q(tasks__is_completed=True)),
+        )
+
+    def recount_counters(self):
+        """Rebuild the stored counters from the task table in a single UPDATE"""
+        tasks = Task.objects.filter(member=OuterRef('pk')).order_by().values('member')
+        completed = tasks.filter(is_completed=True)
+        return self.update(
+            total_credits=Coalesce(Subquery(completed.annotate(n=Sum('credits')).values('n')), Value(0)),
+            total_tasks=Coalesce(Subquery(tasks.annotate(n=Count('pk')).values('n')), Value(0)),
+            completed_tasks=Coalesce(Subquery(completed.annotate(n=Count('pk')).values('n')), Value(0)),
+        )
+
 
 class Member(models.Model):
     name = models.CharField(max_length=100)
@@ -7,20 +48,44 @@ class Member(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Denormalized from Task, kept in sync by members.signals. Only saves and
+    # deletes of Task instances send the signals: after Task QuerySet.update()
+    # or bulk_create(), run rebuild_member_counters.
+    total_credits = models.PositiveIntegerField(default=0, editable=False)
+    total_tasks = models.PositiveIntegerField(default=0, editable=False)
+    completed_tasks = models.PositiveIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ('total_credits', 'total_tasks', 'completed_tasks')
+
+    objects = MemberQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name} ({self.reg_number})"
 
-    def total_credits(self):
-        return sum(task.credits for task in self.tasks.filter(is_completed=True))
+    def save(self, *args, **kwargs):
+        # The counters this instance loaded may be stale by now; writing them
+        # back would undo the deltas the signals applied in the meantime.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
 
-    def total_tasks(self):
-        return self.tasks.count()
-
-    def completed_tasks(self):
-        return self.tasks.filter(is_completed=True).count()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_reg_number = instance.__dict__.get('reg_number')
+        instance._loaded_name = instance.__dict__.get('name')
+        return instance
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['-total_credits', 'name'], name='member_credits_rank_idx'),
+            models.Index(fields=['-created_at'], name='member_recent_idx'),
+        ]
 
 
 class Task(models.Model):
@@ -32,9 +97,467 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     due_date = models.DateTimeField(null=True, blank=True)
+    # Set by save() when the task is completed, cleared when it is reopened
+    completed_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.title} -> {self.member.name}"
 
+    def save(self, *args, **kwargs):
+        # members.signals moves a reopened task's credits out of this bucket
+        self._previous_completed_at = self.completed_at
+        if self.is_completed and self.completed_at is None:
+            self.completed_at = timezone.now()
+        elif not self.is_completed:
+            self.completed_at = None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'is_completed' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'completed_at'}
+        # The counters, leaderboard, rollups and event log that the signals
+        # write commit or roll back together with the row.
+        using = kwargs.get('using') or router.db_for_write(Task, instance=self)
+        with transaction.atomic(using=using):
+            if not self._state.adding:
+                self._lock_counted_state(using)
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(Task, instance=self)
+        with transaction.atomic(using=using):
+            self._lock_counted_state(using)
+            return super().delete(*args, **kwargs)
+
+    def _lock_counted_state(self, using):
+        """Take the state the signals diff against from the locked row, not from this instance.
+
+        Two requests saving copies of the same task would otherwise both apply
+        the change their copy saw. The lock holds until the transaction ends;
+        on SQLite the write lock serializes writers instead.
+        """
+        row = (
+            Task.objects.using(using).select_for_update()
+            .filter(pk=self.pk).values_list('member_id', 'credits', 'is_completed', 'completed_at')
+            .first()
+        )
+        if row is None:
+            self._counted_state = None
+            return
+        self._counted_state = row[:3]
+        self._previous_completed_at = row[3]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_counted_state()
+        return instance
+
+    def _remember_counted_state(self):
+        deferred = self.get_deferred_fields()
+        if deferred & {'member_id', 'credits', 'is_completed'}:
+            self._counted_state = None
+        else:
+            self._counted_state = (self.member_id, self.credits, self.is_completed)
+
+    def counter_contribution(self):
+        """Return the (credits, tasks, completed) this task adds to its member"""
+        return (self.credits if self.is_completed else 0, 1, 1 if self.is_completed else 0)
+
     class Meta:
-        ordering = ['-created_at']
+        # No default ordering: every list that needs one asks for it, and related
+        # manager lookups (counters, exports) shouldn't pay for a sort.
+        indexes = [
+            # Scanned backwards for ORDER BY created_at DESC, id DESC within a member
+            models.Index(fields=['member', 'created_at', 'id'], name='task_member_recent_idx'),
+            models.Index(fields=['-created_at'], name='task_recent_idx'),
+            models.Index(
+                fields=['member', 'credits'],
+                condition=Q(is_completed=True),
+                name='task_completed_credits_idx',
+            ),
+        ]
+
+
+class LeaderboardQuerySet(models.QuerySet):
+    def ranked(self):
+        return self.select_related('member').order_by('-credits', 'member_id')
+
+    def after(self, credits, member_id=None):
+        """Keyset page of entries ranked after (credits, member_id), or below ``credits``"""
+        if member_id is None:
+            return self.ranked().filter(credits__lt=credits)
+        return self.ranked().filter(Q(credits__lt=credits) | Q(credits=credits, member_id__gt=member_id))
+
+    def rank_of(self, member):
+        """Return the member's rank, or None if it has not been ranked yet"""
+        credits = self.filter(member_id=getattr(member, 'pk', member)).values_list('credits', flat=True).first()
+        return None if credits is None else self.rank_for_credits(credits)
+
+    def rank_for_credits(self, credits):
+        """The rank a member with ``credits`` has, e.g. from its loaded ``total_credits``"""
+        return self.filter(credits__gt=credits).count() + 1
+
+    def with_ranks(self, entries, first_page=False):
+        """Set ``rank`` on a page of entries in ``ranked()`` order.
+
+        One COUNT over the credits index finds where the page starts; the
+        rest follows from the page itself. ``first_page`` skips the count.
+        """
+        entries = list(entries)
+        if not entries:
+            return entries
+        counts = {'above': 0, 'before': 0}
+        if not first_page:
+            first = entries[0]
+            counts = self.filter(credits__gte=first.credits).aggregate(
+                above=Count('pk', filter=Q(credits__gt=first.credits)),
+                before=Count('pk', filter=Q(credits__gt=first.credits) | Q(member_id__lt=first.member_id)),
+            )
+        rank = counts['above'] + 1
+        for position, entry in enumerate(entries):
+            if position and entry.credits != entries[position - 1].credits:
+                rank = counts['before'] + position + 1
+            entry.rank = rank
+        return entries
+
+    def add_member(self, member):
+        """Insert an entry for a newly created member"""
+        return self.create(
+            member=member,
+            credits=member.total_credits,
+            total_tasks=member.total_tasks,
+            completed_tasks=member.completed_tasks,
+            completion_rate=_completion_rate(member.completed_tasks, member.total_tasks),
+        )
+
+    def remove_member(self, member_id):
+        self.filter(member_id=member_id).delete()
+
+    def sync_member(self, member_id):
+        """Copy a member's counters into its entry.
+
+        Returns the entry's previous credits and task counts, or None if the
+        member has no entry.
+        """
+        with transaction.atomic():
+            entry = self.select_for_update().filter(member_id=member_id).first()
+            counters = Member.objects.filter(pk=member_id).values(
+                'total_credits', 'total_tasks', 'completed_tasks'
+            ).first()
+            if entry is None or counters is None:
+                return None
+            previous = {
+                'credits': entry.credits,
+                'total_tasks': entry.total_tasks,
+                'completed_tasks': entry.completed_tasks,
+            }
+            entry.credits = counters['total_credits']
+            entry.total_tasks = counters['total_tasks']
+            entry.completed_tasks = counters['completed_tasks']
+            entry.completion_rate = _completion_rate(entry.completed_tasks, entry.total_tasks)
+            entry.save()
+            return previous
+
+    def rebuild(self):
+        """Recompute every entry from the member counters"""
+        members = Member.objects.values_list('pk', 'total_credits', 'total_tasks', 'completed_tasks')
+        with transaction.atomic():
+            self.all().delete()
+            return len(self.bulk_create(
+                (
+                    self.model(
+                        member_id=pk,
+                        credits=credits,
+                        total_tasks=total,
+                        completed_tasks=completed,
+                        completion_rate=_completion_rate(completed, total),
+                    )
+                    for pk, credits, total, completed in members.iterator(chunk_size=2000)
+                ),
+                batch_size=1000,
+            ))
+
+
+def _completion_rate(completed, total):
+    return completed / total * 100 if total else 0
+
+
+class LeaderboardEntry(models.Model):
+    """Materialized ranking of members by credits, maintained by members.signals.
+
+    Ranks use competition ranking (1, 2, 2, 4), so a member's rank is one plus
+    the number of members with strictly more credits. They are worked out on
+    read (``with_ranks``, ``rank_of``) rather than stored, so a change in
+    credits only writes the member's own entry.
+    """
+    member = models.OneToOneField(
+        Member,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        primary_key=True,
+        related_name='leaderboard_entry',
+    )
+    credits = models.PositiveIntegerField(default=0)
+    total_tasks = models.PositiveIntegerField(default=0)
+    completed_tasks = models.PositiveIntegerField(default=0)
+    completion_rate = models.FloatField(default=0)
+
+    objects = LeaderboardQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.member_id} ({self.credits})"
+
+    class Meta:
+        verbose_name_plural = 'leaderboard entries'
+        indexes = [
+            # Keyset paging in ranked() order, and the rank counts
+            models.Index(fields=['-credits', 'member'], name='leaderboard_order_idx'),
+        ]
+
+
+def _bucket_starts(when):
+    """The day and week (starting Monday) buckets a timestamp falls in"""
+    day = timezone.localdate(when)
+    return {TaskRollup.DAY: day, TaskRollup.WEEK: day - timedelta(days=day.weekday())}
+
+
+class TaskRollupQuerySet(models.QuerySet):
+    def adjust(self, when, member_id, credits=0, created=0, completed=0):
+        """Add deltas to the member's and the global day and week buckets for ``when``.
+
+        One UPDATE covers the four rows; rows that don't exist yet are created.
+        """
+        changes = {}
+        if credits:
+            changes['credits_earned'] = F('credits_earned') + credits
+        if created:
+            changes['tasks_created'] = F('tasks_created') + created
+        if completed:
+            changes['tasks_completed'] = F('tasks_completed') + completed
+        if not changes:
+            return
+        starts = _bucket_starts(when)
+        buckets = self.filter(
+            Q(period=self.model.DAY, start=starts[self.model.DAY])
+            | Q(period=self.model.WEEK, start=starts[self.model.WEEK]),
+            Q(member_id=member_id) | Q(member__isnull=True),
+        )
+        if buckets.update(**changes) == 4:
+            return
+        existing = set(buckets.values_list('period', 'member_id'))
+        for period, start in starts.items():
+            for owner in (member_id, None):
+                if (period, owner) in existing:
+                    continue
+                try:
+                    with transaction.atomic():
+                        self.create(
+                            period=period, start=start, member_id=owner,
+                            credits_earned=credits, tasks_created=created, tasks_completed=completed,
+                        )
+                except IntegrityError:
+                    # Another writer created it first
+                    self.filter(period=period, start=start, member_id=owner).update(**changes)
+
+    def trend(self, period, member=None, since=None, until=None):
+        """Buckets for one member (or the global series when None) in date order"""
+        rows = self.filter(period=period).order_by('start')
+        if member is None:
+            rows = rows.filter(member__isnull=True)
+        else:
+            rows = rows.filter(member_id=getattr(member, 'pk', member))
+        if since:
+            rows = rows.filter(start__gte=since)
+        if until:
+            rows = rows.filter(start__lte=until)
+        return rows
+
+    def rebuild(self, members=None):
+        """Recompute every bucket from the task table, or only the given members' buckets"""
+        if members is not None:
+            return self._rebuild_members(members)
+        rows = (
+            self.model(
+                period=period, start=start, member_id=owner,
+                credits_earned=credits, tasks_created=created, tasks_completed=completed,
+            )
+            for period, start, owner, credits, created, completed in rollup_rows(Task.objects.all())
+        )
+        count = 0
+        with transaction.atomic():
+            self.all().delete()
+            for batch in chunked(rows, 1000):
+                count += len(self.bulk_create(batch))
+        return count
+
+    def _rebuild_members(self, member_ids):
+        """Rebuild some members' buckets and move the global rows by the difference"""
+        fields = ('credits_earned', 'tasks_created', 'tasks_completed')
+        with transaction.atomic():
+            old = self.filter(member_id__in=member_ids)
+            deltas = {
+                (period, start): [-credits, -created, -completed]
+                for period, start, credits, created, completed in old.order_by().values('period', 'start').annotate(
+                    credits=Sum('credits_earned'), created=Sum('tasks_created'), completed=Sum('tasks_completed'),
+                ).values_list('period', 'start', 'credits', 'created', 'completed')
+            }
+            old.delete()
+
+            def member_rows():
+                for period, start, owner, *totals in rollup_rows(Task.objects.filter(member_id__in=member_ids)):
+                    if owner is None:
+                        delta = deltas.get((period, start), [0, 0, 0])
+                        deltas[period, start] = [d + n for d, n in zip(delta, totals)]
+                    else:
+                        yield self.model(period=period, start=start, member_id=owner, **dict(zip(fields, totals)))
+
+            count = 0
+            for batch in chunked(member_rows(), 1000):
+                count += len(self.bulk_create(batch))
+            for (period, start), delta in deltas.items():
+                changes = {field: F(field) + n for field, n in zip(fields, delta) if n}
+                if changes and not self.filter(period=period, start=start, member__isnull=True).update(**changes):
+                    self.create(period=period, start=start, **dict(zip(fields, delta)))
+        return count
+
+
+class TaskRollup(models.Model):
+    """Credits earned and tasks created/completed per day or week, per member and globally.
+
+    Maintained by members.signals; ``member`` is null for the global rows.
+    Tasks count in the bucket of their ``created_at``, credits and completions
+    in the bucket of their ``completed_at``.
+    """
+    DAY = 'day'
+    WEEK = 'week'
+    PERIOD_CHOICES = [(DAY, 'Day'), (WEEK, 'Week')]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    start = models.DateField()
+    # Like LeaderboardEntry: removed by a Member post_delete receiver, after the
+    # task deletes of the cascade have finished adjusting these rows
+    member = models.ForeignKey(
+        Member,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='rollups',
+    )
+    credits_earned = models.IntegerField(default=0)
+    tasks_created = models.IntegerField(default=0)
+    tasks_completed = models.IntegerField(default=0)
+
+    objects = TaskRollupQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.period} {self.start} {self.member_id or 'all'}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['member', 'period', 'start'], name='rollup_member_bucket_unique'),
+            # NULLs never collide in a unique index, so the global rows need their own
+            models.UniqueConstraint(
+                fields=['period', 'start'],
+                condition=Q(member__isnull=True),
+                name='rollup_global_bucket_unique',
+            ),
+        ]
+
+
+class LiveEvent(models.Model):
+    """Append-only feed behind the Server-Sent Events stream (see members.live)"""
+    TASK_COMPLETED = 'task_completed'
+    CREDITS_CHANGED = 'credits_changed'
+    RANK_CHANGED = 'rank_changed'
+    KIND_CHOICES = [
+        (TASK_COMPLETED, 'Task completed'),
+        (CREDITS_CHANGED, 'Credits changed'),
+        (RANK_CHANGED, 'Rank changed'),
+    ]
+
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.pk} {self.kind}"
+
+
+class TaskEventQuerySet(models.QuerySet):
+    def since(self, seq):
+        return self.filter(seq__gt=seq).order_by('seq')
+
+    def append(self, events):
+        connection = connections[self.db]
+        if connection.vendor == 'postgresql':
+            # Sequence values are handed out at INSERT but become visible at
+            # COMMIT; holding this lock until commit keeps the two orders the
+            # same, so a reader that has seen seq N never misses a lower one.
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [TASK_EVENT_LOCK])
+        return self.bulk_create(events)
+
+
+# Arbitrary key for pg_advisory_xact_lock
+TASK_EVENT_LOCK = 7_270_417
+
+
+class TaskEvent(models.Model):
+    """Append-only log of task changes, written in the transaction that makes them.
+
+    ``seq`` only grows, so a consumer remembers the last one it processed and
+    reads what came after it instead of rescanning tasks. Ids are plain
+    integers rather than foreign keys so events outlive deleted tasks and
+    members. Bulk loaders (create_sample_data, import_tracker) append the
+    same events the signals would; wiping the data appends a ``reset``
+    event, after which consumers start over from the current tasks.
+    """
+    CREATED = 'created'
+    COMPLETED = 'completed'
+    REOPENED = 'reopened'
+    CREDITS_CHANGED = 'credits_changed'
+    REASSIGNED = 'reassigned'
+    DELETED = 'deleted'
+    RESET = 'reset'
+    KIND_CHOICES = [
+        (CREATED, 'Created'),
+        (COMPLETED, 'Completed'),
+        (REOPENED, 'Reopened'),
+        (CREDITS_CHANGED, 'Credits changed'),
+        (REASSIGNED, 'Reassigned'),
+        (DELETED, 'Deleted'),
+        (RESET, 'Reset'),
+    ]
+
+    seq = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    task_id = models.BigIntegerField()
+    member_id = models.BigIntegerField()
+    credits = models.PositiveIntegerField()
+    previous_member_id = models.BigIntegerField(null=True, blank=True)
+    previous_credits = models.PositiveIntegerField(null=True, blank=True)
+    at = models.DateTimeField(default=timezone.now)
+
+    objects = TaskEventQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.seq} {self.kind} task {self.task_id}"
+
+    @classmethod
+    def for_change(cls, task, previous=None):
+        """Events for saving ``task`` over ``(member_id, credits, is_completed)``, or creating it"""
+        current = {'task_id': task.pk, 'member_id': task.member_id, 'credits': task.credits}
+        if previous is None:
+            events = [cls(kind=cls.CREATED, **current)]
+            if task.is_completed:
+                events.append(cls(kind=cls.COMPLETED, **current))
+            return events
+        old_member_id, old_credits, old_completed = previous
+        events = []
+        if old_member_id != task.member_id:
+            events.append(cls(kind=cls.REASSIGNED, previous_member_id=old_member_id, **current))
+        if old_credits != task.credits:
+            events.append(cls(kind=cls.CREDITS_CHANGED, previous_credits=old_credits, **current))
+        if old_completed != task.is_completed:
+            events.append(cls(kind=cls.COMPLETED if task.is_completed else cls.REOPENED, **current))
+        return events
@@ -0,0 +1,98 @@
+"""
+Read replicas for the read-only tracker pages, API and exports.
+
+``ReadReplicaMiddleware`` picks a replica per request (round-robin over
+``settings.DATABASE_REPLICAS``) for safe requests to the ``members`` URLs and
+pins it in a context variable; ``ReplicaRouter`` sends that request's reads
+of tracker models there. Everything else - the admin, writes, sessions and
+users, and requests without a pinned replica - uses ``default``.
+
+Read-your-writes: a request that writes reads from the primary for the rest
+of the request, and an unsafe request (an admin save, a login) sets a cookie
+that keeps that browser on the primary for ``REPLICA_STICKY_SECONDS``, longer
+than replicas are expected to lag. Those requests also skip the page cache
+lookup (members.cache), since another visitor may have cached a render from
+a lagging replica under the versions the write just bumped; the primary's
+render then replaces that entry. Other visitors may see a lagging replica
+until then, or until the page's TTL or next invalidation.
+"""
+
+import itertools
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.urls import Resolver404, get_resolver
+
+STICKY_COOKIE = 'falcon_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_alias = ContextVar('members_read_alias', default=None)
+_rotation = itertools.count()
+
+
+def replica_for(request):
+    """The replica alias to serve ``request`` from, or None for the primary"""
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas or request.method not in SAFE_METHODS or reads_from_primary(request):
+        return None
+    try:
+        match = get_resolver(getattr(request, 'urlconf', None)).resolve(request.path_info)
+    except Resolver404:
+        return None
+    if match.namespace != 'members':
+        return None
+    return replicas[next(_rotation) % len(replicas)]
+
+
+def reads_from_primary(request):
+    """Whether ``request`` carries the cookie that keeps it on the primary after a write"""
+    return bool(settings.DATABASE_REPLICAS) and STICKY_COOKIE in request.COOKIES
+
+
+def pin(alias):
+    """Send reads in the current context to ``alias``; returns a token for ``unpin``"""
+    return _read_alias.set(alias)
+
+
+def unpin(token):
+    _read_alias.reset(token)
+
+
+def pinned_stream(content, alias):
+    """Keep a streaming response's reads on ``alias`` while the server iterates it"""
+    iterator = iter(content)
+    while True:
+        token = pin(alias)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            unpin(token)
+        yield chunk
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Sessions and users stay on the primary so a fresh login is seen at once
+        if model._meta.app_label != 'members':
+            return None
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Anything this request reads from now on must see the write
+        if _read_alias.get() is not None:
+            _read_alias.set(None)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,226 @@
+"""
+Full-text search over members and tasks.
+
+The index is one table, ``members_search`` (created by migration 0008), with
+a row per member and per task. On SQLite it is an FTS5 virtual table; on
+PostgreSQL it is a tsvector column with a GIN index. Row ids encode the source row (task id * 2,
+member id * 2 + 1), so members.signals keeps the index in sync with keyed
+writes. The admin filters through an indexed subquery instead of
+``LIKE '%q%'`` scans over a join.
+
+Every word of a query must match, and each word matches as a prefix ("ali"
+finds "Alice"). Titles and names rank above the other text. Other database
+backends have no index: ``index_for`` returns None and callers fall back to
+``icontains`` lookups.
+"""
+
+import re
+
+from django.db import connections, router
+from django.db.models.expressions import RawSQL
+from django.db.models import Q
+
+from .bulk import chunked
+from .models import Member, Task
+
+TABLE = 'members_search'
+TASK, MEMBER = 0, 1
+MAX_TERMS = 8
+# Ids per statement when reindexing many rows
+CHUNK_SIZE = 500
+
+# What each row indexes: (title, body) SQL over members_task t / members_member m
+TASK_TEXT = ("t.title", "COALESCE(t.description, '') || ' ' || m.name || ' ' || m.reg_number")
+MEMBER_TEXT = ("m.name", "m.reg_number || ' ' || m.email")
+
+
+def terms(query):
+    return re.findall(r'[^\W_]+', query.lower())[:MAX_TERMS]
+
+
+class SQLiteIndex:
+    id_column = 'rowid'
+    match_sql = f'{TABLE} MATCH %s'
+    rank_sql = f'bm25({TABLE}, 4.0, 1.0)'
+
+    def document(self, title, body):
+        return '(rowid, title, body)', f'{title}, {body}'
+
+    def expression(self, words):
+        return ' '.join(f'"{word}"*' for word in words)
+
+
+class PostgresIndex:
+    id_column = 'id'
+    match_sql = "document @@ to_tsquery('simple', %s)"
+    rank_sql = "-ts_rank(document, to_tsquery('simple', %s))"
+
+    def document(self, title, body):
+        return '(id, document)', (
+            f"setweight(to_tsvector('simple', {title}), 'A') || setweight(to_tsvector('simple', {body}), 'B')"
+        )
+
+    def expression(self, words):
+        return ' & '.join(f'{word}:*' for word in words)
+
+
+def index_for(connection):
+    if connection.vendor == 'sqlite':
+        return SQLiteIndex()
+    if connection.vendor == 'postgresql':
+        return PostgresIndex()
+    return None
+
+
+def _write(using, delete_where, task_where=None, member_where=None, params=()):
+    """Delete the rows matching ``delete_where`` and re-add the selected tasks and members"""
+    connection = connections[using]
+    index = index_for(connection)
+    if index is None:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE {delete_where}', params)
+        if task_where:
+            columns, values = index.document(*TASK_TEXT)
+            cursor.execute(
+                f'INSERT INTO {TABLE} {columns} SELECT t.id * 2, {values} '
+                f'FROM members_task t JOIN members_member m ON m.id = t.member_id WHERE {task_where}',
+                params,
+            )
+        if member_where:
+            columns, values = index.document(*MEMBER_TEXT)
+            cursor.execute(
+                f'INSERT INTO {TABLE} {columns} SELECT m.id * 2 + 1, {values} FROM members_member m WHERE {member_where}',
+                params,
+            )
+
+
+def index_task(pk, using='default'):
+    index = index_for(connections[using])
+    if index is None:
+        return
+    _write(using, f'{index.id_column} = %s * 2', task_where='t.id = %s', params=[pk])
+
+
+def index_member(pk, with_tasks=False, using='default'):
+    """Reindex a member, and their tasks too when the name or reg number they carry changed"""
+    index = index_for(connections[using])
+    if index is None:
+        return
+    _write(using, f'{index.id_column} = %s * 2 + 1', member_where='m.id = %s', params=[pk])
+    if with_tasks:
+        _write(
+            using, f'{index.id_column} IN (SELECT id * 2 FROM members_task WHERE member_id = %s)',
+            task_where='t.member_id = %s', params=[pk],
+        )
+
+
+def index_members(pks, with_tasks=False, using='default'):
+    """``index_member`` for many members, a chunk of ids per statement"""
+    index = index_for(connections[using])
+    if index is None:
+        return
+    for chunk in chunked(pks, CHUNK_SIZE):
+        marks = ', '.join(['%s'] * len(chunk))
+        _write(
+            using, f'{index.id_column} IN (SELECT id * 2 + 1 FROM members_member WHERE id IN ({marks}))',
+            member_where=f'm.id IN ({marks})', params=chunk,
+        )
+        if with_tasks:
+            _write(
+                using, f'{index.id_column} IN (SELECT id * 2 FROM members_task WHERE member_id IN ({marks}))',
+                task_where=f't.member_id IN ({marks})', params=chunk,
+            )
+
+
+def index_tasks(pks, using='default'):
+    """``index_task`` for many tasks, a chunk of ids per statement"""
+    index = index_for(connections[using])
+    if index is None:
+        return
+    for chunk in chunked(pks, CHUNK_SIZE):
+        marks = ', '.join(['%s'] * len(chunk))
+        _write(
+            using, f'{index.id_column} IN (SELECT id * 2 FROM members_task WHERE id IN ({marks}))',
+            task_where=f't.id IN ({marks})', params=chunk,
+        )
+
+
+def remove(kind, pk, using='default'):
+    index = index_for(connections[using])
+    if index is None:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE {index.id_column} = %s', [pk * 2 + kind])
+
+
+def remove_many(kind, pks, using='default'):
+    index = index_for(connections[using])
+    if index is None:
+        return
+    with connections[using].cursor() as cursor:
+        for chunk in chunked(pks, CHUNK_SIZE):
+            marks = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'DELETE FROM {TABLE} WHERE {index.id_column} IN ({marks})', [pk * 2 + kind for pk in chunk])
+
+
+def rebuild(using='default'):
+    """Re-create every row from the member and task tables"""
+    _write(using, '1 = 1', task_where='1 = 1', member_where='1 = 1')
+
+
+def _matches(index, kind, words):
+    return (
+        f'SELECT {index.id_column} / 2 FROM {TABLE} WHERE {index.match_sql} AND {index.id_column} %% 2 = %s',
+        [index.expression(words), kind],
+    )
+
+
+def filter_queryset(queryset, query):
+    """Narrow a Member or Task queryset to the rows matching ``query``.
+
+    Returns None when there is nothing to search with: no index on this
+    database, or no words in the query.
+    """
+    words = terms(query)
+    index = index_for(connections[queryset.db])
+    if index is None or not words:
+        return None
+    sql, params = _matches(index, MEMBER if queryset.model is Member else TASK, words)
+    return queryset.filter(pk__in=RawSQL(sql, params))
+
+
+def search(query, limit=20):
+    """Best matches for ``query``: ``{'members': [...], 'tasks': [...]}`` in rank order"""
+    words = terms(query)
+    if not words:
+        return {'members': [], 'tasks': []}
+    using = router.db_for_read(Task)
+    index = index_for(connections[using])
+    if index is None:
+        return _search_without_index(words, limit)
+
+    results = {}
+    for name, kind, queryset in (
+        ('members', MEMBER, Member.objects.using(using)),
+        ('tasks', TASK, Task.objects.using(using).select_related('member')),
+    ):
+        sql, params = _matches(index, kind, words)
+        rank_params = [index.expression(words)] * index.rank_sql.count('%s')
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'{sql} ORDER BY {index.rank_sql} LIMIT %s', params + rank_params + [limit])
+            ids = [row[0] for row in cursor.fetchall()]
+        found = queryset.in_bulk(ids)
+        results[name] = [found[pk] for pk in ids if pk in found]
+    return results
+
+
+def _search_without_index(words, limit):
+    members, tasks = Q(), Q()
+    for word in words:
+        members &= Q(name__icontains=word) | Q(reg_number__icontains=word) | Q(email__icontains=word)
+        tasks &= Q(title__icontains=word) | Q(member__name__icontains=word) | Q(member__reg_number__icontains=word)
+    return {
+        'members': list(Member.objects.filter(members).order_by('name')[:limit]),
+        'tasks': list(Task.objects.filter(tasks).select_related('member').order_by('-created_at')[:limit]),
+    }
@@ -0,0 +1,73 @@
+from rest_framework import serializers
+
+from .models import LeaderboardEntry, Member, Task, TaskEvent, TaskRollup
+
+
+class SparseFieldsMixin:
+    """Trim the output to ``?fields=a,b,c`` when the request asks for it"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        fields = request.query_params.get('fields') if request else None
+        if fields:
+            wanted = {name.strip() for name in fields.split(',')}
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
+
+
+class MemberSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Member
+        # No email: the API is readable without logging in
+        fields = ('reg_number', 'name', 'total_credits', 'total_tasks', 'completed_tasks', 'created_at', 'updated_at')
+
+
+class MemberStatsSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    pending_tasks = serializers.SerializerMethodField()
+    completion_rate = serializers.SerializerMethodField()
+    rank = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Member
+        fields = ('reg_number', 'total_credits', 'total_tasks', 'completed_tasks', 'pending_tasks', 'completion_rate', 'rank')
+
+    def get_pending_tasks(self, member):
+        return member.total_tasks - member.completed_tasks
+
+    def get_completion_rate(self, member):
+        return member.completed_tasks / member.total_tasks * 100 if member.total_tasks else 0
+
+    def get_rank(self, member):
+        return self.context.get('rank')
+
+
+class TaskSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    member = serializers.SlugRelatedField(slug_field='reg_number', read_only=True)
+
+    class Meta:
+        model = Task
+        fields = ('id', 'member', 'title', 'description', 'credits', 'is_completed', 'created_at', 'updated_at', 'completed_at', 'due_date')
+
+
+class LeaderboardEntrySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Set by LeaderboardQuerySet.with_ranks
+    rank = serializers.IntegerField(read_only=True)
+    reg_number = serializers.CharField(source='member.reg_number')
+    name = serializers.CharField(source='member.name')
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = ('rank', 'reg_number', 'name', 'credits', 'completed_tasks', 'total_tasks', 'completion_rate')
+
+
+class TaskRollupSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = TaskRollup
+        fields = ('start', 'credits_earned', 'tasks_created', 'tasks_completed')
+
+
+class TaskEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TaskEvent
+        fields = ('seq', 'kind', 'task_id', 'member_id', 'credits', 'previous_member_id', 'previous_credits', 'at')
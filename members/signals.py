@@ -0,0 +1,318 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, QuerySet, Subquery
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache, live, search
+from .models import LeaderboardEntry, Member, Task, TaskEvent, TaskRollup
+
+
+def _contribution(member_id, credits, is_completed):
+    return Task(member_id=member_id, credits=credits, is_completed=is_completed).counter_contribution()
+
+
+def _member_cascade(origin):
+    """Whether a task is being deleted because its member is.
+
+    The Task delete receivers skip their per-task bookkeeping then, and
+    ``clean_up_member_tasks`` does it once per member.
+    """
+    if isinstance(origin, Member):
+        return True
+    return isinstance(origin, QuerySet) and origin.model is Member
+
+
+@receiver(pre_save, sender=Task)
+def capture_previous_task_state(sender, instance, raw, **kwargs):
+    """Make sure we know what the row looked like before this save.
+
+    Task.save() has already read it under a row lock; this covers direct
+    save_base() calls that bypass it. Fixture loads (``raw``) maintain
+    nothing here; the members app's loaddata rebuilds the derived tables once
+    the fixtures are in.
+    """
+    if raw or instance.pk is None or getattr(instance, '_counted_state', None) is not None:
+        return
+    instance._counted_state = (
+        Task.objects.filter(pk=instance.pk)
+        .values_list('member_id', 'credits', 'is_completed')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Task)
+def update_member_counters_on_save(sender, instance, created, raw, **kwargs):
+    """Move the task's contribution from its previous state to the current one"""
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_counted_state', None)
+    new = instance.counter_contribution()
+
+    moves = {}
+    if previous is None:
+        Member.objects.filter(pk=instance.member_id).adjust_counters(*new)
+    elif previous[0] != instance.member_id:
+        old = _contribution(*previous)
+        Member.objects.filter(pk=previous[0]).adjust_counters(*(-n for n in old))
+        Member.objects.filter(pk=instance.member_id).adjust_counters(*new)
+        moves[previous[0]] = LeaderboardEntry.objects.sync_member(previous[0])
+    else:
+        old = _contribution(*previous)
+        Member.objects.filter(pk=instance.member_id).adjust_counters(
+            *(n - o for n, o in zip(new, old))
+        )
+    moves[instance.member_id] = LeaderboardEntry.objects.sync_member(instance.member_id)
+    # Previous leaderboard values, for the live events sent below
+    instance._leaderboard_moves = moves
+    instance._remember_counted_state()
+
+
+@receiver(post_delete, sender=Task)
+def update_member_counters_on_delete(sender, instance, origin=None, **kwargs):
+    """Remove the deleted task's contribution from its member"""
+    if _member_cascade(origin):
+        return
+    previous = getattr(instance, '_counted_state', None)
+    if previous is None:
+        previous = (instance.member_id, instance.credits, instance.is_completed)
+    Member.objects.filter(pk=previous[0]).adjust_counters(*(-n for n in _contribution(*previous)))
+    instance._leaderboard_moves = {previous[0]: LeaderboardEntry.objects.sync_member(previous[0])}
+
+
+@receiver(post_delete, sender=Task)
+def collect_member_cascade(sender, instance, origin=None, **kwargs):
+    if _member_cascade(origin):
+        if not hasattr(origin, '_deleted_tasks'):
+            origin._deleted_tasks = defaultdict(list)
+        origin._deleted_tasks[instance.member_id].append(instance)
+
+
+@receiver(post_delete, sender=Member)
+def clean_up_member_tasks(sender, instance, origin=None, using='default', **kwargs):
+    """Set-based cleanup for the tasks a member's delete cascaded to.
+
+    Runs after the task rows are gone and before the leaderboard entry goes.
+    Counters need nothing (the member is gone), rollups are handled by
+    ``remove_member_rollups`` and pages by ``invalidate_pages_on_member_delete``.
+    """
+    tasks = getattr(origin, '_deleted_tasks', {}).pop(instance.pk, [])
+    if not tasks:
+        return
+    TaskEvent.objects.append([
+        TaskEvent(kind=TaskEvent.DELETED, task_id=task.pk, member_id=task.member_id, credits=task.credits)
+        for task in tasks
+    ])
+    search.remove_many(search.TASK, [task.pk for task in tasks], using=using)
+    live.publish_member_removed(instance)
+
+
+@receiver(post_save, sender=Member)
+def add_member_to_leaderboard(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        LeaderboardEntry.objects.add_member(instance)
+
+
+@receiver(post_delete, sender=Member)
+def remove_member_from_leaderboard(sender, instance, **kwargs):
+    LeaderboardEntry.objects.remove_member(instance.pk)
+
+
+@receiver(post_save, sender=Task)
+def update_rollups_on_task_save(sender, instance, created, raw, **kwargs):
+    """Count the task in its creation bucket and its credits in its completion bucket"""
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_cache_state', None)
+    if previous is None:
+        TaskRollup.objects.adjust(instance.created_at, instance.member_id, created=1)
+        if instance.is_completed:
+            TaskRollup.objects.adjust(instance.completed_at, instance.member_id, credits=instance.credits, completed=1)
+        return
+    old_member_id, old_credits, old_completed = previous
+    if old_member_id != instance.member_id:
+        TaskRollup.objects.adjust(instance.created_at, old_member_id, created=-1)
+        TaskRollup.objects.adjust(instance.created_at, instance.member_id, created=1)
+
+    # Take the old completion out of its bucket and put the current one in
+    changes = []
+    if old_completed:
+        old_at = getattr(instance, '_previous_completed_at', None) or timezone.now()
+        changes.append((old_at, old_member_id, -old_credits, -1))
+    if instance.is_completed:
+        changes.append((instance.completed_at, instance.member_id, instance.credits, 1))
+    if len(changes) == 2 and changes[0][:2] == changes[1][:2]:
+        changes = [(changes[0][0], changes[0][1], changes[0][2] + changes[1][2], 0)]
+    for when, member_id, credits, completed in changes:
+        TaskRollup.objects.adjust(when, member_id, credits=credits, completed=completed)
+
+
+@receiver(post_delete, sender=Task)
+def update_rollups_on_task_delete(sender, instance, origin=None, **kwargs):
+    if _member_cascade(origin):
+        return
+    previous = getattr(instance, '_counted_state', None)
+    if previous is None:
+        previous = (instance.member_id, instance.credits, instance.is_completed)
+    member_id, credits, completed = previous
+    TaskRollup.objects.adjust(instance.created_at, member_id, created=-1)
+    if completed:
+        TaskRollup.objects.adjust(instance.completed_at or timezone.now(), member_id, credits=-credits, completed=-1)
+
+
+@receiver(post_delete, sender=Member)
+def remove_member_rollups(sender, instance, **kwargs):
+    """Take the member's buckets out of the global rows, then drop them"""
+    own = TaskRollup.objects.filter(member_id=instance.pk)
+    same_bucket = own.filter(period=OuterRef('period'), start=OuterRef('start'))
+    TaskRollup.objects.filter(Exists(same_bucket), member__isnull=True).update(**{
+        field: F(field) - Subquery(same_bucket.values(field))
+        for field in ('credits_earned', 'tasks_created', 'tasks_completed')
+    })
+    own.delete()
+
+
+def _invalidate_on_commit(*groups):
+    transaction.on_commit(lambda: cache.invalidate(*groups), robust=True)
+
+
+def _reg_numbers(instance, member_ids):
+    """reg_number by member id, read once per save and shared by the receivers below"""
+    known = instance.__dict__.setdefault('_reg_numbers', {})
+    missing = set(member_ids) - known.keys()
+    if missing:
+        known.update(Member.objects.filter(pk__in=missing).values_list('pk', 'reg_number'))
+    return known
+
+
+def _member_groups(instance, *member_ids):
+    reg_numbers = _reg_numbers(instance, member_ids)
+    return [cache.member_group(reg_numbers[pk]) for pk in member_ids if pk in reg_numbers]
+
+
+@receiver(pre_save, sender=Task)
+def capture_task_cache_state(sender, instance, **kwargs):
+    instance._cache_state = getattr(instance, '_counted_state', None)
+    instance._reg_numbers = {}
+
+
+# Connected before the page invalidation receivers below, so on commit the
+# events are written before the cache versions move: a page rendered in
+# between would show the new totals with an old live_since, stay cached, and
+# have every client that loads it replay the event's delta on top.
+@receiver(post_save, sender=Task)
+def publish_live_events_on_task_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_cache_state', None)
+    completed_by = None
+    if instance.is_completed and (previous is None or not previous[2]):
+        completed_by = _reg_numbers(instance, [instance.member_id])[instance.member_id]
+    live.publish_task_change(instance, getattr(instance, '_leaderboard_moves', {}), completed_by)
+
+
+@receiver(post_delete, sender=Task)
+def publish_live_events_on_task_delete(sender, instance, origin=None, **kwargs):
+    if _member_cascade(origin):
+        return
+    live.publish_task_change(instance, getattr(instance, '_leaderboard_moves', {}))
+
+
+@receiver(post_save, sender=Task)
+def invalidate_pages_on_task_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_cache_state', None)
+    member_ids = {instance.member_id}
+    groups = [cache.DASHBOARD, cache.MEMBER_LIST, cache.LEADERBOARD]
+    if previous is not None:
+        member_ids.add(previous[0])
+        if _contribution(*previous)[0] != instance.counter_contribution()[0] or previous[0] != instance.member_id:
+            groups.append(cache.RANKING)
+    elif instance.counter_contribution()[0]:
+        groups.append(cache.RANKING)
+    _invalidate_on_commit(*groups, *_member_groups(instance, *member_ids))
+
+
+@receiver(post_delete, sender=Task)
+def invalidate_pages_on_task_delete(sender, instance, origin=None, **kwargs):
+    if _member_cascade(origin):
+        return
+    groups = [cache.DASHBOARD, cache.MEMBER_LIST, cache.LEADERBOARD]
+    if instance.counter_contribution()[0]:
+        groups.append(cache.RANKING)
+    _invalidate_on_commit(*groups, *_member_groups(instance, instance.member_id))
+
+
+@receiver(post_save, sender=Member)
+def invalidate_pages_on_member_save(sender, instance, created, **kwargs):
+    groups = [cache.DASHBOARD, cache.MEMBER_LIST, cache.LEADERBOARD, cache.member_group(instance.reg_number)]
+    previous_reg_number = getattr(instance, '_loaded_reg_number', None)
+    if previous_reg_number and previous_reg_number != instance.reg_number:
+        groups.append(cache.member_group(previous_reg_number))
+    instance._loaded_reg_number = instance.reg_number
+    _invalidate_on_commit(*groups)
+
+
+@receiver(post_delete, sender=Member)
+def invalidate_pages_on_member_delete(sender, instance, **kwargs):
+    _invalidate_on_commit(
+        cache.DASHBOARD, cache.MEMBER_LIST, cache.LEADERBOARD, cache.RANKING,
+        cache.member_group(instance.reg_number),
+    )
+
+
+@receiver(post_save, sender=Task)
+def log_task_events_on_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_cache_state', None)
+    events = TaskEvent.for_change(instance, previous)
+    if events:
+        TaskEvent.objects.append(events)
+
+
+@receiver(post_delete, sender=Task)
+def log_task_event_on_delete(sender, instance, origin=None, **kwargs):
+    if _member_cascade(origin):
+        return
+    previous = getattr(instance, '_counted_state', None) or (instance.member_id, instance.credits, instance.is_completed)
+    TaskEvent.objects.append([
+        TaskEvent(kind=TaskEvent.DELETED, task_id=instance.pk, member_id=previous[0], credits=previous[1]),
+    ])
+
+
+@receiver(post_save, sender=Task)
+def index_task_on_save(sender, instance, using, update_fields, raw, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not {'title', 'description', 'member'} & set(update_fields):
+        return
+    search.index_task(instance.pk, using=using)
+
+
+@receiver(post_delete, sender=Task)
+def remove_task_from_index(sender, instance, using, origin=None, **kwargs):
+    if _member_cascade(origin):
+        return
+    search.remove(search.TASK, instance.pk, using=using)
+
+
+@receiver(pre_save, sender=Member)
+def capture_member_search_state(sender, instance, **kwargs):
+    # Tasks index their member's name and reg number
+    loaded = (getattr(instance, '_loaded_name', None), getattr(instance, '_loaded_reg_number', None))
+    instance._task_text_changed = instance.pk is not None and loaded != (instance.name, instance.reg_number)
+
+
+@receiver(post_save, sender=Member)
+def index_member_on_save(sender, instance, created, using, raw, **kwargs):
+    if raw:
+        return
+    search.index_member(instance.pk, with_tasks=not created and instance._task_text_changed, using=using)
+    instance._loaded_name = instance.name
+
+
+@receiver(post_delete, sender=Member)
+def remove_member_from_index(sender, instance, using, **kwargs):
+    search.remove(search.MEMBER, instance.pk, using=using)
@@ -0,0 +1,27 @@
+"""Test helpers for holding views to their performance budgets."""
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .middleware import get_budget
+
+
+class QueryBudgetMixin:
+    """TestCase mixin that fails when a view runs more queries than its budget.
+
+    Budgets come from ``settings.PERFORMANCE_BUDGETS``, keyed by URL name, the
+    same table the middleware logs against in production.
+    """
+
+    def assertWithinQueryBudget(self, view_name, *args, client=None, data=None, using='default'):
+        budget = get_budget(view_name).get('queries')
+        if budget is None:
+            self.fail(f'No query budget configured for {view_name!r}')
+        client = client or self.client
+        with CaptureQueriesContext(connections[using]) as queries:
+            response = client.get(reverse(view_name, args=args), data)
+        if len(queries) > budget:
+            listing = '\n'.join(f"{i}. {q['sql']}" for i, q in enumerate(queries.captured_queries, start=1))
+            self.fail(f'{view_name} ran {len(queries)} queries, budget is {budget}:\n{listing}')
+        return response
@@ -1,3 +1,1146 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from itertools import islice
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.contrib.auth import get_user_model
+from django.core.cache import cache as django_cache
+from django.db import connection, router
+from django.db.models import Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import cache, live, metrics, routers, search, views
+from .admin import EstimatedCountPaginator, TaskAdmin
+from .management.commands import benchmark_views
+from .management.commands.import_tracker import Command as ImportCommand
+from .middleware import ReadReplicaMiddleware
+from .testing import QueryBudgetMixin
+from .models import LeaderboardEntry, LiveEvent, Member, Task, TaskEvent, TaskRollup
+
+TEST_METRICS_DB = os.path.join(tempfile.gettempdir(), f'falcon-test-metrics-{os.getpid()}.sqlite3')
+
+
+def tearDownModule():
+    with override_settings(METRICS_DB=TEST_METRICS_DB):
+        # Nothing left for the exit-time flush to write back
+        metrics.get_store().flush()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(TEST_METRICS_DB + suffix):
+            os.remove(TEST_METRICS_DB + suffix)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    METRICS_ENABLED=False,
+    # Page cache hit/miss counters live in the metrics store
+    METRICS_DB=TEST_METRICS_DB,
+)
+class TrackerTestCase(TestCase):
+    def setUp(self):
+        django_cache.clear()
+        cache.reset_stats()
+
+
+class MemberCounterTests(TrackerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = Member.objects.create(name='Alice', reg_number='REG001', email='alice@example.com')
+        self.bob = Member.objects.create(name='Bob', reg_number='REG002', email='bob@example.com')
+
+    def assertCounters(self, member, credits, tasks, completed):
+        member.refresh_from_db()
+        self.assertEqual(
+            (member.total_credits, member.total_tasks, member.completed_tasks),
+            (credits, tasks, completed),
+        )
+
+    def test_task_lifecycle_updates_counters(self):
+        task = Task.objects.create(member=self.alice, title='Docs', credits=30)
+        self.assertCounters(self.alice, 0, 1, 0)
+
+        task.is_completed = True
+        task.save()
+        self.assertCounters(self.alice, 30, 1, 1)
+
+        task.credits = 50
+        task.save()
+        self.assertCounters(self.alice, 50, 1, 1)
+
+        task.member = self.bob
+        task.save()
+        self.assertCounters(self.alice, 0, 0, 0)
+        self.assertCounters(self.bob, 50, 1, 1)
+
+        Task.objects.get(pk=task.pk).delete()
+        self.assertCounters(self.bob, 0, 0, 0)
+
+    def test_queryset_delete_and_deferred_instances(self):
+        Task.objects.create(member=self.alice, title='A', credits=10, is_completed=True)
+        Task.objects.create(member=self.alice, title='B', credits=20, is_completed=True)
+
+        task = Task.objects.only('title').get(title='A')
+        task.is_completed = False
+        task.save()
+        self.assertCounters(self.alice, 20, 2, 1)
+
+        Task.objects.filter(member=self.alice).delete()
+        self.assertCounters(self.alice, 0, 0, 0)
+
+    def test_stale_task_copies_count_a_change_once(self):
+        task = Task.objects.create(member=self.alice, title='Docs', credits=10)
+        first, second = Task.objects.get(pk=task.pk), Task.objects.get(pk=task.pk)
+
+        first.is_completed = second.is_completed = True
+        first.save()
+        second.save()
+        self.assertCounters(self.alice, 10, 1, 1)
+        self.assertEqual(TaskRollup.objects.get(period=TaskRollup.DAY, member=self.alice).credits_earned, 10)
+
+        second.delete()
+        self.assertCounters(self.alice, 0, 0, 0)
+
+    def test_saving_a_stale_member_keeps_counters(self):
+        Task.objects.create(member=self.alice, title='A', credits=60, is_completed=True)
+        stale = Member.objects.get(pk=self.alice.pk)
+        Task.objects.create(member=self.alice, title='B', credits=5, is_completed=True)
+
+        stale.name = 'Alice Smith'
+        stale.save()
+        self.assertCounters(self.alice, 65, 2, 2)
+        self.assertEqual(self.alice.name, 'Alice Smith')
+
+    def test_rebuild_command_repairs_drift(self):
+        Task.objects.create(member=self.alice, title='A', credits=10, is_completed=True)
+        Member.objects.filter(pk=self.alice.pk).update(total_credits=999)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_member_counters', verify=True, stdout=StringIO())
+
+        call_command('rebuild_member_counters', stdout=StringIO())
+        self.assertCounters(self.alice, 10, 1, 1)
+
+
+class SampleDataTests(TrackerTestCase):
+    def test_bulk_generation_keeps_counters_consistent(self):
+        call_command('create_sample_data', members=20, tasks_per_member=5, seed=1, batch_size=7, stdout=StringIO())
+        call_command('create_sample_data', members=5, seed=2, append=True, stdout=StringIO())
+
+        self.assertEqual(Member.objects.count(), 25)
+        self.assertEqual(Task.objects.filter(member__reg_number='REG001').count(), 5)
+        self.assertEqual(LeaderboardEntry.objects.count(), 25)
+        call_command('rebuild_member_counters', verify=True, stdout=StringIO())
+
+    def test_bulk_generation_logs_events_and_resets_the_log(self):
+        old = Task.objects.create(
+            member=Member.objects.create(name='Old', reg_number='OLD001', email='old@example.com'), title='Old',
+            credits=5, is_completed=True,
+        )
+        LiveEvent.objects.create(kind=LiveEvent.TASK_COMPLETED, data={'task': old.pk})
+        logged = TaskEvent.objects.count()
+        call_command('create_sample_data', members=3, tasks_per_member=4, seed=1, batch_size=5, stdout=StringIO())
+
+        # The old rows stay in the log, followed by the reset and the new tasks
+        events = list(TaskEvent.objects.since(0).values_list('kind', 'task_id'))
+        self.assertEqual(events[:logged], [(TaskEvent.CREATED, old.pk), (TaskEvent.COMPLETED, old.pk)])
+        self.assertEqual(events[logged][0], TaskEvent.RESET)
+        kinds = [kind for kind, _ in events[logged + 1:]]
+        self.assertEqual(kinds.count(TaskEvent.CREATED), Task.objects.count())
+        self.assertEqual(kinds.count(TaskEvent.COMPLETED), Task.objects.filter(is_completed=True).count())
+        self.assertEqual({task_id for _, task_id in events[logged + 1:]}, set(Task.objects.values_list('pk', flat=True)))
+
+        # Nothing derived from the wiped rows is left behind
+        self.assertFalse(LiveEvent.objects.exists())
+        self.assertFalse(TaskRollup.objects.filter(member__reg_number='OLD001').exists())
+        self.assertEqual(TaskRollup.objects.filter(member__isnull=True, period=TaskRollup.DAY).aggregate(
+            total=Sum('tasks_created'))['total'], Task.objects.count())
+        self.assertFalse(Task.objects.filter(pk__in=search.filter_queryset(Task.objects.all(), 'Old')).exists())
+
+
+class FixtureTests(TrackerTestCase):
+    def rollups(self):
+        return list(TaskRollup.objects.order_by('period', 'start', 'member_id').values_list(
+            'period', 'start', 'member_id', 'credits_earned', 'tasks_created',
+        ))
+
+    def test_loaddata_rebuilds_what_the_signals_skip(self):
+        alice = Member.objects.create(name='Alice', reg_number='REG001', email='alice@example.com')
+        Task.objects.create(member=alice, title='Docs', credits=30, is_completed=True)
+        Task.objects.create(member=alice, title='Tests', credits=20)
+        path = os.path.join(tempfile.mkdtemp(), 'tracker.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        call_command('dumpdata', 'members.member', 'members.task', output=path, stdout=StringIO())
+        rollups = self.rollups()
+        alice.delete()
+        logged = TaskEvent.objects.count()
+
+        call_command('loaddata', path, stdout=StringIO())
+
+        self.assertEqual(list(Member.objects.values_list('total_credits', 'total_tasks', 'completed_tasks')), [(30, 2, 1)])
+        self.assertEqual(list(LeaderboardEntry.objects.values_list('member__reg_number', 'credits')), [('REG001', 30)])
+        self.assertEqual(self.rollups(), rollups)
+        self.assertEqual(Member.objects.filter(pk__in=search.filter_queryset(Member.objects.all(), 'alice')).count(), 1)
+        # No per-row events for the fixture's tasks, only the reset
+        self.assertEqual(list(TaskEvent.objects.since(0)[logged:].values_list('kind', flat=True)), [TaskEvent.RESET])
+
+
+class LoadTestCommandTests(TrackerTestCase):
+    def test_rejects_unknown_views_in_mix(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown view'):
+            call_command('loadtest', mix='dashboard=1,admin=2', stdout=StringIO())
+
+    def test_requires_members_for_detail_requests(self):
+        with self.assertRaisesMessage(CommandError, 'No members'):
+            call_command('loadtest', mix='member_detail=1', stdout=StringIO())
+
+    def test_sqlite_benchmark_rejects_unknown_profiles(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown SQLite profile'):
+            call_command('benchmark_sqlite', profiles='default,turbo', stdout=StringIO())
+
+    def test_query_benchmark_restores_the_indexes_it_drops(self):
+        member = Member.objects.create(name='Alice', reg_number='REG001', email='alice@example.com')
+        Task.objects.create(member=member, title='Docs', credits=30)
+        stdout = StringIO()
+        call_command('benchmark_queries', repeat=1, explain=True, without_indexes=True, stdout=stdout)
+        self.assertNotIn('task_member_recent_idx', stdout.getvalue())
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Task._meta.db_table)
+        self.assertIn('task_member_recent_idx', constraints)
+
+    def test_view_benchmark_reports_every_view(self):
+        path = os.path.join(tempfile.mkdtemp(), 'views.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        performance_log = logging.getLogger('members.performance')
+        self.addCleanup(performance_log.setLevel, performance_log.level)
+        # Already running in a test database and test environment
+        with patch.object(connection.creation, 'create_test_db'), patch.object(connection.creation, 'destroy_test_db'), \
+                patch.object(benchmark_views, 'setup_test_environment'), \
+                patch.object(benchmark_views, 'teardown_test_environment'):
+            call_command('benchmark_views', scales='2', requests=1, warmup=0, output=path, stdout=StringIO())
+
+        with open(path) as fh:
+            results = json.load(fh)
+        self.assertEqual(set(results['scales']), {'2'})
+        views = results['scales']['2']
+        self.assertEqual(set(views), set(benchmark_views.TARGETS))
+        for target, result in views.items():
+            with self.subTest(view=target):
+                self.assertEqual(set(result), {
+                    'status', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'queries', 'peak_memory_kb', 'response_bytes',
+                })
+                self.assertEqual(result['status'], 200)
+                self.assertGreater(result['queries'], 0)
+
+
+
+class ImportTests(TrackerTestCase):
+    def write(self, name, content):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, name)
+        with open(path, 'w') as fh:
+            fh.write(content)
+        return path
+
+    def test_upserts_members_and_resolves_task_members(self):
+        Member.objects.create(name='Old Name', reg_number='REG001', email='alice@example.com')
+        members = self.write('members.csv', (
+            'reg_number,name,email\n'
+            'REG001,Alice,alice@example.com\n'
+            'REG002,Bob,bob@example.com\n'
+            'REG003,Mallory,alice@example.com\n'
+        ))
+        call_command('import_tracker', 'members', members, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(
+            list(Member.objects.order_by('reg_number').values_list('reg_number', 'name')),
+            [('REG001', 'Alice'), ('REG002', 'Bob')],
+        )
+
+        tasks = self.write('tasks.ndjson', (
+            '{"member": "REG001", "title": "Docs", "credits": 30, "is_completed": true}\n'
+            '{"member": "REG002", "title": "Tests", "credits": 20, "is_completed": true}\n'
+        ))
+        call_command('import_tracker', 'tasks', tasks, batch_size=1, stdout=StringIO())
+        self.assertEqual(LeaderboardEntry.objects.rank_of(Member.objects.get(reg_number='REG001')), 1)
+        call_command('rebuild_member_counters', verify=True, stdout=StringIO())
+        self.assertFalse(os.path.exists(f'{tasks}.checkpoint'))
+
+    def test_rejects_rows_that_would_break_the_batch(self):
+        members = self.write('members.csv', (
+            'reg_number,name,email\n'
+            'REG001,Alice,alice@example.com\n'
+            'REG002,Mallory,alice@example.com\n'
+        ))
+        stderr = StringIO()
+        call_command('import_tracker', 'members', members, stdout=StringIO(), stderr=stderr)
+        self.assertEqual(list(Member.objects.values_list('reg_number', flat=True)), ['REG001'])
+        self.assertIn('Row 2: email alice@example.com already belongs to REG001', stderr.getvalue())
+
+        header_only = self.write('empty.csv', 'member,title,credits,is_completed\n')
+        call_command('import_tracker', 'tasks', header_only, stdout=StringIO())
+
+    def test_updates_derived_tables_for_touched_rows(self):
+        alice = Member.objects.create(name='Alice', reg_number='REG001', email='alice@example.com')
+        Member.objects.create(name='Bob', reg_number='REG002', email='bob@example.com')
+        Task.objects.create(member=alice, title='Existing', credits=5, is_completed=True)
+        tasks = self.write('tasks.csv', (
+            'member,title,credits,is_completed\n'
+            'REG002,Tests,20,true\n'
+            'REG002,Review,10,false\n'
+        ))
+        call_command('import_tracker', 'tasks', tasks, stdout=StringIO())
+
+        self.assertEqual(Task.objects.filter(is_completed=True, member__reg_number='REG002').count(), 1)
+        self.assertEqual(LeaderboardEntry.objects.rank_of(Member.objects.get(reg_number='REG002')), 1)
+        self.assertEqual(LeaderboardEntry.objects.rank_of(alice), 2)
+        self.assertEqual([task.title for task in search.search('review')['tasks']], ['Review'])
+        incremental = sorted(TaskRollup.objects.values_list(
+            'period', 'start', 'member_id', 'credits_earned', 'tasks_created', 'tasks_completed',
+        ), key=str)
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(sorted(TaskRollup.objects.values_list(
+            'period', 'start', 'member_id', 'credits_earned', 'tasks_created', 'tasks_completed',
+        ), key=str), incremental)
+
+    def test_resume_skips_committed_rows(self):
+        Member.objects.create(name='Alice', reg_number='REG001', email='alice@example.com')
+        tasks = self.write('tasks.ndjson', (
+            '{"member": "REG001", "title": "Already imported"}\n'
+            '{"member": "REG001", "title": "Still to do"}\n'
+        ))
+        with open(f'{tasks}.checkpoint', 'w') as fh:
+            json.dump({'rows': 1}, fh)
+        call_command('import_tracker', 'tasks', tasks, resume=True, stdout=StringIO())
+        self.assertEqual(list(Task.objects.values_list('title', flat=True)), ['Still to do'])
+
+    def test_resume_updates_derived_tables_for_the_crashed_run(self):
+        first = Member.objects.create(name='First', reg_number='R1', email='r1@example.com')
+        Member.objects.create(name='Second', reg_number='R2', email='r2@example.com')
+        tasks = self.write('tasks.ndjson', (
+            '{"member": "R1", "title": "Zebra crossing", "credits": 50, "is_completed": true}\n'
+            '{"member": "R2", "title": "Tests", "credits": 10, "is_completed": true}\n'
+        ))
+        upsert_tasks = ImportCommand.upsert_tasks
+
+        def crash_on_second_batch(command, batch):
+            if command.touched_tasks:
+                raise RuntimeError('crashed')
+            upsert_tasks(command, batch)
+
+        with patch.object(ImportCommand, 'upsert_tasks', crash_on_second_batch):
+            with self.assertRaisesMessage(RuntimeError, 'crashed'):
+                call_command('import_tracker', 'tasks', tasks, batch_size=1, stdout=StringIO())
+        call_command('import_tracker', 'tasks', tasks, batch_size=1, resume=True, stdout=StringIO())
+
+        self.assertEqual(LeaderboardEntry.objects.get(member=first).credits, 50)
+        self.assertEqual(LeaderboardEntry.objects.rank_of(first), 1)
+        self.assertTrue(TaskRollup.objects.filter(member=first).exists())
+        self.assertEqual([task.title for task in search.search('zebra')['tasks']], ['Zebra crossing'])
+
+    def test_logs_task_events(self):
+        alice = Member.objects.create(name='Alice', reg_number='REG001', email='alice@example.com')
+        Member.objects.create(name='Bob', reg_number='REG002', email='bob@example.com')
+        existing = Task.objects.create(member=alice, title='Docs', credits=10)
+        seq = TaskEvent.objects.latest('seq').seq
+        tasks = self.write('tasks.ndjson', (
+            f'{{"id": {existing.pk}, "member": "REG002", "title": "Docs", "credits": 10, "is_completed": true}}\n'
+            '{"member": "REG001", "title": "Tests", "credits": 20}\n'
+        ))
+        call_command('import_tracker', 'tasks', tasks, stdout=StringIO())
+
+        created = Task.objects.get(title='Tests')
+        self.assertEqual(list(TaskEvent.objects.since(seq).values_list('kind', 'task_id', 'previous_member_id')), [
+            (TaskEvent.REASSIGNED, existing.pk, alice.pk),
+            (TaskEvent.COMPLETED, existing.pk, None),
+            (TaskEvent.CREATED, created.pk, None),
+        ])
+
+
+class ViewTests(TrackerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.member = Member.objects.create(name='Alice', reg_number='REG001', email='alice@example.com')
+        Task.objects.create(member=self.member, title='Docs', credits=30, is_completed=True)
+        Task.objects.create(member=self.member, title='Tests', credits=20)
+
+    def test_pages_render(self):
+        for url in (
+            reverse('members:dashboard'),
+            reverse('members:member_list'),
+            reverse('members:leaderboard'),
+            reverse('members:member_detail', args=[self.member.reg_number]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Alice')
+
+    def test_member_detail_fetches_tasks_once(self):
+        url = reverse('members:member_detail', args=[self.member.reg_number])
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual([t.title for t in response.context['completed_tasks']], ['Docs'])
+        self.assertEqual([t.title for t in response.context['pending_tasks']], ['Tests'])
+        self.assertEqual(response.context['completion_rate'], 50)
+
+    def test_dashboard_runs_a_fixed_number_of_queries(self):
+        for i in range(8):
+            Task.objects.create(member=self.member, title=f'Task {i}', credits=10, is_completed=i % 2 == 0)
+        # headline totals, recent members, recent tasks with members, top performers, live event id
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('members:dashboard'))
+        self.assertEqual(
+            [response.context[key] for key in ('total_members', 'total_tasks', 'completed_tasks', 'total_credits')],
+            [1, 10, 5, 70],
+        )
+        self.assertEqual(len(response.context['recent_tasks']), 5)
+
+    def test_pages_are_cached_until_data_changes(self):
+        url = reverse('members:member_detail', args=[self.member.reg_number])
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(member=self.member, title='Review', credits=5)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_current_etag_short_circuits_without_queries(self):
+        url = reverse('members:dashboard')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(member=self.member, title='Review', credits=5)
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unrelated_member_page_survives_task_edit(self):
+        other = Member.objects.create(name='Bob', reg_number='REG002', email='bob@example.com')
+        url = reverse('members:member_detail', args=[other.reg_number])
+        self.client.get(url)
+
+        task = Task.objects.get(title='Tests')
+        task.title = 'Integration tests'
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+
+@override_settings(ASYNC_CONCURRENT_QUERIES=False)
+class AsyncViewTests(TrackerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.member = Member.objects.create(name='Alice', reg_number='REG001', email='alice@example.com')
+        Task.objects.create(member=self.member, title='Docs', credits=30, is_completed=True)
+        Task.objects.create(member=self.member, title='Tests', credits=20)
+        self.factory = AsyncRequestFactory()
+
+    async def test_async_views_render_the_same_pages(self):
+        pages = [
+            (views.dashboard, views.adashboard, '/', ()),
+            (views.member_list, views.amember_list, '/members/', ()),
+            (views.leaderboard, views.aleaderboard, '/leaderboard/?after=0', ()),
+            (views.member_detail, views.amember_detail, '/members/REG001/', ('REG001',)),
+        ]
+        for sync_view, async_view, url, args in pages:
+            with self.subTest(view=sync_view.__name__):
+                expected = await sync_to_async(sync_view)(self.factory.get(url), *args)
+                response = await async_view(self.factory.get(url), *args)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, expected.content)
+
+    async def test_middleware_counts_queries_under_asgi(self):
+        response = await self.async_client.get(reverse('members:leaderboard'))
+        self.assertIn('desc="3 queries"', response['Server-Timing'])
+
+    @override_settings(METRICS_ENABLED=True)
+    async def test_middleware_records_metrics_off_the_event_loop(self):
+        on_loop = []
+
+        def observe(request, response, stats):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+
+        with patch.object(metrics, 'observe_request', side_effect=observe):
+            await self.async_client.get(reverse('members:leaderboard'))
+        self.assertEqual(on_loop, [False])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    METRICS_ENABLED=False,
+    ASYNC_CONCURRENT_QUERIES=True,
+)
+class ConcurrentQueryTests(TransactionTestCase):
+    async def test_dashboard_queries_run_on_pool_threads(self):
+        member = await Member.objects.acreate(name='Alice', reg_number='REG001', email='alice@example.com')
+        await Task.objects.acreate(member=member, title='Docs', credits=30, is_completed=True)
+
+        with patch.dict(connection.settings_dict, CONN_MAX_AGE=600):
+            context = views._dashboard_context(await views._gather(views._dashboard_queries()))
+        self.assertEqual((context['total_members'], context['total_tasks'], context['total_credits']), (1, 1, 30))
+        self.assertEqual([task.member.name for task in context['recent_tasks']], ['Alice'])
+
+    async def test_queries_share_a_capped_executor(self):
+        threads = set()
+
+        def query():
+            threads.add(threading.current_thread().name)
+            time.sleep(0.01)
+
+        queries = {n: query for n in range(settings.ASYNC_QUERY_THREADS * 3)}
+        with patch.dict(connection.settings_dict, CONN_MAX_AGE=600):
+            await views._gather(queries)
+        self.assertLessEqual(len(threads), settings.ASYNC_QUERY_THREADS)
+        self.assertTrue(all(name.startswith('falcon-query') for name in threads))
+
+        threads.clear()
+        with patch.dict(connection.settings_dict, CONN_MAX_AGE=0):
+            await views._gather(queries)
+        # Without persistent connections they share the request's one thread hop
+        self.assertEqual(len(threads), 1)
+
+
+class LeaderboardTests(TrackerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.members = [
+            Member.objects.create(name=name, reg_number=f'REG00{i}', email=f'{name.lower()}@example.com')
+            for i, name in enumerate(['Alice', 'Bob', 'Carol', 'Dave'], start=1)
+        ]
+
+    def assertEntriesMatchRebuild(self):
+        stored = list(LeaderboardEntry.objects.ranked().values_list('member_id', 'credits', 'completed_tasks'))
+        LeaderboardEntry.objects.rebuild()
+        self.assertEqual(stored, list(LeaderboardEntry.objects.ranked().values_list('member_id', 'credits', 'completed_tasks')))
+
+    def test_incremental_ranks_match_full_rebuild(self):
+        alice, bob, carol, dave = self.members
+        task = Task.objects.create(member=alice, title='A', credits=50, is_completed=True)
+        Task.objects.create(member=bob, title='B', credits=30, is_completed=True)
+        Task.objects.create(member=carol, title='C', credits=30, is_completed=True)
+        self.assertEntriesMatchRebuild()
+        self.assertEqual(LeaderboardEntry.objects.rank_of(bob), 2)
+        self.assertEqual(LeaderboardEntry.objects.rank_of(dave), 4)
+
+        task.credits = 10
+        task.save()
+        self.assertEntriesMatchRebuild()
+        self.assertEqual(LeaderboardEntry.objects.rank_of(alice), 3)
+
+        task.member = dave
+        task.save()
+        bob.delete()
+        self.assertEntriesMatchRebuild()
+        self.assertEqual(LeaderboardEntry.objects.rank_of(carol), 1)
+
+    def test_saves_only_write_their_own_entry(self):
+        alice = self.members[0]
+        with CaptureQueriesContext(connection) as queries:
+            Task.objects.create(member=alice, title='A', credits=50, is_completed=True)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "members_leaderboardentry"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(LeaderboardEntry.objects.rank_of(alice), 1)
+        self.assertEqual(LeaderboardEntry.objects.rank_of(self.members[1]), 2)
+
+    def test_page_ranks_carry_ties_across_pages(self):
+        for member, credits in zip(self.members, [50, 30, 30, 10]):
+            Task.objects.create(member=member, title='T', credits=credits, is_completed=True)
+        first = LeaderboardEntry.objects.with_ranks(LeaderboardEntry.objects.ranked()[:2], first_page=True)
+        with self.assertNumQueries(2):
+            rest = LeaderboardEntry.objects.with_ranks(LeaderboardEntry.objects.after(first[1].credits, first[1].member_id))
+        self.assertEqual([entry.rank for entry in first + rest], [1, 2, 2, 4])
+
+    def test_keyset_pagination(self):
+        for member in self.members:
+            Task.objects.create(member=member, title='T', credits=10, is_completed=True)
+        first = LeaderboardEntry.objects.ranked()[:2]
+        rest = LeaderboardEntry.objects.after(first[1].credits, first[1].member_id)
+        self.assertEqual(
+            [e.member_id for e in first] + [e.member_id for e in rest],
+            sorted(m.pk for m in self.members),
+        )
+
+
+@override_settings(LIVE_EVENTS_POLL_INTERVAL=0, LIVE_EVENTS_MAX_STREAM=1)
+class LiveEventTests(TrackerTestCase):
+    def setUp(self):
+        super().setUp()
+        live.feed.reset()
+        self.alice = Member.objects.create(name='Alice', reg_number='REG001', email='alice@example.com')
+        self.bob = Member.objects.create(name='Bob', reg_number='REG002', email='bob@example.com')
+        Task.objects.create(member=self.alice, title='Docs', credits=30, is_completed=True)
+
+    def test_task_changes_publish_events_on_commit(self):
+        # Loaded without its member, as the admin's change form does
+        task = Task.objects.get(pk=Task.objects.create(member=self.bob, title='Tests', credits=50).pk)
+        self.assertFalse(LiveEvent.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            task.is_completed = True
+            task.save()
+
+        events = {event.kind: event.data for event in LiveEvent.objects.order_by('pk')}
+        self.assertEqual(events['task_completed']['member'], 'REG002')
+        # One reg number lookup, shared with the page invalidation
+        reg_number_reads = [
+            query for query in queries.captured_queries
+            if '"members_member"."reg_number"' in query['sql'] and 'FROM "members_member"' in query['sql']
+        ]
+        self.assertEqual(len(reg_number_reads), 1)
+        self.assertEqual(events['credits_changed']['delta'], {'credits': 50, 'tasks': 0, 'completed': 1})
+        self.assertEqual(
+            (events['rank_changed']['rank'], events['rank_changed']['previous_rank']),
+            (1, 2),
+        )
+
+    def test_events_are_written_before_pages_are_invalidated(self):
+        task = Task.objects.create(member=self.bob, title='Tests', credits=50)
+        seen = []
+        with patch.object(cache, 'invalidate', side_effect=lambda *groups: seen.append(LiveEvent.objects.count())):
+            with self.captureOnCommitCallbacks(execute=True):
+                task.is_completed = True
+                task.save()
+        self.assertTrue(seen)
+        self.assertTrue(all(seen))
+
+    def test_failed_event_insert_does_not_fail_the_save(self):
+        task = Task.objects.create(member=self.bob, title='Tests', credits=50)
+        with patch.object(live, '_write', side_effect=RuntimeError), self.assertLogs('django.test', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                task.is_completed = True
+                task.save()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.total_credits, 50)
+
+    @override_settings(LIVE_EVENTS_ENABLED=True)
+    def test_stream_resumes_after_last_event_id(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(member=self.bob, title='Tests', credits=50, is_completed=True)
+        first = LiveEvent.objects.order_by('pk').first()
+
+        response = self.client.get(reverse('members:live_events'), headers={'Last-Event-ID': str(first.pk)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(islice(response.streaming_content, 2)).decode()
+        self.assertNotIn(f'id: {first.pk}\n', body)
+        self.assertIn('event: credits_changed', body)
+        self.assertIn('event: rank_changed', body)
+
+    def test_sync_workers_get_no_stream(self):
+        response = self.client.get(reverse('members:live_events'))
+        self.assertEqual(response.status_code, 204)
+        self.assertNotContains(self.client.get(reverse('members:dashboard')), 'data-live-events')
+
+        with override_settings(LIVE_EVENTS_ENABLED=True):
+            django_cache.clear()
+            self.assertContains(self.client.get(reverse('members:dashboard')), 'data-live-events')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRoutingTests(TrackerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.read_from = []
+
+    def view(self, request):
+        self.read_from.append(router.db_for_read(Member))
+        response = HttpResponse()
+        response.write_to = router.db_for_write(Member)
+        response.after_write = router.db_for_read(Member)
+        return response
+
+    def test_tracker_reads_rotate_over_replicas(self):
+        middleware = ReadReplicaMiddleware(self.view)
+        for _ in range(3):
+            middleware(self.factory.get(reverse('members:leaderboard')))
+        self.assertEqual(len(set(self.read_from)), 2)
+        self.assertTrue(set(self.read_from) <= {'replica1', 'replica2'})
+        self.assertEqual(router.db_for_read(Member), 'default')
+
+    def test_writes_and_admin_use_the_primary(self):
+        middleware = ReadReplicaMiddleware(self.view)
+        response = middleware(self.factory.get(reverse('members:dashboard')))
+        self.assertEqual((response.write_to, response.after_write), ('default', 'default'))
+        middleware(self.factory.get('/admin/members/task/'))
+        self.assertEqual(self.read_from[-1], 'default')
+        token = routers.pin('replica1')
+        try:
+            self.assertEqual(router.db_for_read(get_user_model()), 'default')
+        finally:
+            routers.unpin(token)
+
+    def test_unsafe_requests_stick_to_the_primary(self):
+        middleware = ReadReplicaMiddleware(self.view)
+        response = middleware(self.factory.post('/admin/members/task/'))
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+        request = self.factory.get(reverse('members:dashboard'))
+        request.COOKIES[routers.STICKY_COOKIE] = '1'
+        middleware(request)
+        self.assertEqual(self.read_from[-1], 'default')
+
+    def test_primary_readers_replace_cached_pages(self):
+        renders = []
+
+        @cache.cached_page([cache.DASHBOARD])
+        def page(request):
+            renders.append(router.db_for_read(Member))
+            return HttpResponse(f'render {len(renders)}')
+
+        page(self.factory.get('/page/'))
+        request = self.factory.get('/page/')
+        request.COOKIES[routers.STICKY_COOKIE] = '1'
+        self.assertEqual(page(request).content, b'render 2')
+        self.assertEqual(page(self.factory.get('/page/')).content, b'render 2')
+
+    def test_streamed_exports_read_from_the_replica(self):
+        def view(request):
+            return StreamingHttpResponse(router.db_for_read(Member) for _ in range(2))
+
+        response = ReadReplicaMiddleware(view)(self.factory.get(reverse('members:export', args=['tasks'])))
+        chunks = set(response.streaming_content)
+        self.assertEqual(len(chunks), 1)
+        self.assertIn(chunks.pop(), (b'replica1', b'replica2'))
+        self.assertEqual(router.db_for_read(Member), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_the_primary(self):
+        response = ReadReplicaMiddleware(self.view)(self.factory.post(reverse('members:dashboard')))
+        self.assertEqual(self.read_from, ['default'])
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+
+class SearchTests(QueryBudgetMixin, TrackerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = Member.objects.create(name='Alice Johnson', reg_number='REG001', email='alice@example.com')
+        self.bob = Member.objects.create(name='Bob Smith', reg_number='REG002', email='bob@example.com')
+        self.docs = Task.objects.create(member=self.alice, title='Write documentation', credits=30)
+        Task.objects.create(member=self.bob, title='Review pull requests', description='Docs and code', credits=20)
+
+    def index_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid, title, body FROM {search.TABLE} ORDER BY rowid')
+            return cursor.fetchall()
+
+    def test_words_match_as_prefixes_and_titles_rank_first(self):
+        results = search.search('doc')
+        self.assertEqual([task.title for task in results['tasks']], ['Write documentation', 'Review pull requests'])
+        results = search.search('ali john')
+        self.assertEqual(results['members'], [self.alice])
+        self.assertEqual(results['tasks'], [self.docs])
+        self.assertEqual(search.search('ali smith'), {'members': [], 'tasks': []})
+
+    def test_index_follows_saves_and_deletes(self):
+        self.docs.title = 'Draft changelog'
+        self.docs.save()
+        self.alice.name = 'Alicia Keys'
+        self.alice.save()
+        self.assertEqual(search.search('changelog keys')['tasks'], [self.docs])
+        self.assertEqual(search.search('johnson'), {'members': [], 'tasks': []})
+        self.bob.delete()
+        self.assertEqual(search.search('review')['tasks'], [])
+
+        incremental = self.index_rows()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.index_rows(), incremental)
+
+    def test_admin_search_uses_the_index(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:members_task_changelist'), {'q': 'bob'})
+        self.assertEqual(list(response.context['cl'].result_list), list(Task.objects.filter(member=self.bob)))
+        self.assertTrue(any(search.TABLE in query['sql'] for query in queries.captured_queries))
+
+    def test_search_page(self):
+        response = self.assertWithinQueryBudget('members:search', data={'q': 'alice'})
+        self.assertContains(response, 'Alice Johnson')
+        self.assertContains(response, 'Write documentation')
+        self.assertEqual(self.client.get(reverse('members:search'), {'q': '!!'}).status_code, 200)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TrackerTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(1, 6):
+            member = Member.objects.create(name=f'Member {i}', reg_number=f'REG00{i}', email=f'm{i}@example.com')
+            for j in range(3):
+                Task.objects.create(member=member, title=f'Task {j}', credits=10, is_completed=j > 0)
+
+    def test_public_views_stay_within_budget(self):
+        self.assertWithinQueryBudget('members:dashboard')
+        self.assertWithinQueryBudget('members:member_list')
+        self.assertWithinQueryBudget('members:leaderboard')
+        self.assertWithinQueryBudget('members:member_detail', 'REG001')
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('members:leaderboard'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="3 queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertGreater(response.wsgi_request.performance.template_ms, 0)
+
+
+class AdminChangelistTests(TrackerTestCase):
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def create_members(self, start, count):
+        for i in range(start, start + count):
+            member = Member.objects.create(name=f'Member {i}', reg_number=f'REG{i:03}', email=f'm{i}@example.com')
+            Task.objects.create(member=member, title=f'Task {i}', credits=10, is_completed=True)
+
+    def assertConstantQueries(self, url):
+        self.create_members(0, 2)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.create_members(2, 8)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(len(small), len(large))
+
+    def test_member_changelist_query_count_is_constant(self):
+        self.assertConstantQueries(reverse('admin:members_member_changelist'))
+
+    def test_task_changelist_query_count_is_constant(self):
+        self.assertConstantQueries(reverse('admin:members_task_changelist'))
+
+    def test_task_changelist_total_comes_from_member_counters(self):
+        self.create_members(0, 3)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:members_task_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertIsNone(response.context['cl'].full_result_count)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] and 'members_task' in query['sql'] for query in queries.captured_queries
+        ))
+
+    def test_filtered_counts_are_capped(self):
+        self.create_members(0, 5)
+        with patch.object(EstimatedCountPaginator, 'count_cap', 3):
+            response = self.client.get(reverse('admin:members_task_changelist'), {'is_completed__exact': '1'})
+            searched = self.client.get(reverse('admin:members_task_changelist'), {'q': 'task'})
+        self.assertContains(searched, '3+ results')
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertTrue(response.context['cl'].paginator.capped)
+        self.assertContains(response, '3+ tasks')
+
+    def test_pages_past_the_cap_stay_reachable(self):
+        self.create_members(0, 7)
+        url = reverse('admin:members_task_changelist')
+        params = {'is_completed__exact': '1'}
+        with patch.object(TaskAdmin, 'list_per_page', 2):
+            expected = list(self.client.get(url, {**params, 'p': 3}).context['cl'].result_list)
+            with patch.object(EstimatedCountPaginator, 'count_cap', 3):
+                response = self.client.get(url, {**params, 'p': 3})
+                self.assertEqual(response.context['cl'].paginator.num_pages, 4)
+                last = self.client.get(url, {**params, 'p': 4})
+                self.assertEqual(last.context['cl'].paginator.num_pages, 4)
+                # Past the last row the admin falls back to its error redirect
+                self.assertEqual(self.client.get(url, {**params, 'p': 5}).status_code, 302)
+        self.assertEqual(list(response.context['cl'].result_list), expected)
+        self.assertEqual(len(expected), 2)
+        self.assertEqual(len(last.context['cl'].result_list), 1)
+
+    def test_deep_pages_match_offset_pages(self):
+        self.create_members(0, 7)
+        url = reverse('admin:members_task_changelist')
+        with patch.object(TaskAdmin, 'list_per_page', 3):
+            expected = list(self.client.get(url, {'p': 2}).context['cl'].result_list)
+            with patch.object(EstimatedCountPaginator, 'deferred_join_offset', 0):
+                response = self.client.get(url, {'p': 2})
+        self.assertEqual(list(response.context['cl'].result_list), expected)
+        self.assertEqual(len(expected), 3)
+
+    def test_task_form_autocompletes_the_member(self):
+        self.create_members(0, 3)
+        response = self.client.get(reverse('admin:members_task_add'))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, 'Member 2 (REG002)')
+
+
+class ExportTests(TrackerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.member = Member.objects.create(name='Alice', reg_number='REG001', email='alice@example.com')
+        Task.objects.create(member=self.member, title='Docs', credits=30, is_completed=True)
+        Task.objects.create(member=self.member, title='Tests', credits=20)
+        User = get_user_model()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def test_streams_filtered_tasks_as_ndjson(self):
+        response = self.client.get(reverse('members:export', args=['tasks']), {'format': 'ndjson', 'completed': 'true'})
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(row['member'], row['title']) for row in rows], [('REG001', 'Docs')])
+
+    def test_streams_leaderboard_as_csv(self):
+        response = self.client.get(reverse('members:export', args=['leaderboard']))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'rank,member,name,credits,completed_tasks,total_tasks,completion_rate')
+        self.assertEqual(lines[1], '1,REG001,Alice,30,1,2,50.0')
+
+    def test_rejects_bad_filters(self):
+        response = self.client.get(reverse('members:export', args=['tasks']), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_filters_the_export_cannot_apply(self):
+        response = self.client.get(reverse('members:export', args=['leaderboard']), {'since': '2024-01-01'})
+        self.assertContains(response, 'The leaderboard export has no since filter', status_code=400)
+        response = self.client.get(reverse('members:export', args=['members']), {'completed': 'true'})
+        self.assertEqual(response.status_code, 400)
+        with self.assertRaisesMessage(CommandError, 'The members export has no completed filter'):
+            call_command('export_tracker', 'members', completed='true', stdout=StringIO())
+
+    def test_csv_cells_cannot_start_formulas(self):
+        Task.objects.create(member=self.member, title='=HYPERLINK("http://example.com")', description='-1+2')
+        path = os.path.join(tempfile.mkdtemp(), 'tasks.csv')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        call_command('export_tracker', 'tasks', output=path, stderr=StringIO())
+        with open(path, newline='', encoding='utf-8') as fh:
+            row = list(csv.DictReader(fh))[-1]
+        self.assertEqual((row['title'], row['description']), ("'=HYPERLINK(\"http://example.com\")", "'-1+2"))
+
+        # Importing the file back restores the original text
+        Task.objects.filter(pk=row['id']).update(title='Changed')
+        call_command('import_tracker', 'tasks', path, stdout=StringIO(), stderr=StringIO())
+        task = Task.objects.get(pk=row['id'])
+        self.assertEqual((task.title, task.description), ('=HYPERLINK("http://example.com")', '-1+2'))
+
+
+class RollupTests(TrackerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = Member.objects.create(name='Alice', reg_number='REG001', email='alice@example.com')
+        self.bob = Member.objects.create(name='Bob', reg_number='REG002', email='bob@example.com')
+
+    def snapshot(self):
+        return sorted(
+            (row.period, row.start, row.member_id or 0, row.credits_earned, row.tasks_created, row.tasks_completed)
+            for row in TaskRollup.objects.all()
+        )
+
+    def test_incremental_updates_match_a_rebuild(self):
+        docs = Task.objects.create(member=self.alice, title='Docs', credits=30, is_completed=True)
+        tests = Task.objects.create(member=self.alice, title='Tests', credits=20)
+        Task.objects.create(member=self.bob, title='Review', credits=10, is_completed=True)
+        tests.is_completed = True
+        tests.save()
+        docs.is_completed = False
+        docs.save()
+        tests.member = self.bob
+        tests.save()
+        Task.objects.get(title='Review').delete()
+
+        week = TaskRollup.objects.trend(TaskRollup.WEEK).get()
+        self.assertEqual((week.credits_earned, week.tasks_created, week.tasks_completed), (20, 2, 1))
+        self.assertEqual(TaskRollup.objects.trend(TaskRollup.DAY, self.bob).get().credits_earned, 20)
+        incremental = self.snapshot()
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_credits_land_in_the_completion_bucket(self):
+        task = Task.objects.create(member=self.alice, title='Docs', credits=30)
+        created = timezone.now() - timedelta(days=10)
+        Task.objects.filter(pk=task.pk).update(created_at=created)
+        call_command('rebuild_rollups', stdout=StringIO())
+        task.refresh_from_db()
+        task.is_completed = True
+        task.save()
+
+        days = {row.start: row for row in TaskRollup.objects.trend(TaskRollup.DAY)}
+        self.assertEqual(days[timezone.localdate(created)].tasks_created, 1)
+        self.assertEqual(days[timezone.localdate()].credits_earned, 30)
+        incremental = self.snapshot()
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_member_delete_drops_its_rollups(self):
+        Task.objects.create(member=self.alice, title='Docs', credits=30, is_completed=True)
+        member_id = self.alice.pk
+        self.alice.delete()
+        self.assertFalse(TaskRollup.objects.filter(member_id=member_id).exists())
+        self.assertEqual(TaskRollup.objects.trend(TaskRollup.DAY).get().tasks_created, 0)
+
+    def test_member_delete_cleans_up_its_tasks_in_bulk(self):
+        for number in range(20):
+            Task.objects.create(member=self.alice, title=f'Task {number}', credits=5, is_completed=number % 2 == 0)
+        Task.objects.create(member=self.bob, title='Review', credits=10, is_completed=True)
+        task_ids = list(self.alice.tasks.values_list('pk', flat=True))
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            self.alice.delete()
+        self.assertLess(len(queries), 30)
+
+        incremental = self.snapshot()
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+        self.assertEqual(
+            sorted(TaskEvent.objects.filter(kind=TaskEvent.DELETED).values_list('task_id', flat=True)), task_ids,
+        )
+        self.assertEqual(search.search('task')['tasks'], [])
+        self.assertEqual(LeaderboardEntry.objects.rank_of(self.bob), 1)
+        self.assertEqual(LiveEvent.objects.get(kind=LiveEvent.CREDITS_CHANGED).data['delta'], {
+            'credits': -50, 'tasks': -20, 'completed': -10,
+        })
+
+        Member.objects.all().delete()
+        self.assertFalse(TaskRollup.objects.filter(tasks_created__gt=0).exists())
+
+    def test_trends_api(self):
+        Task.objects.create(member=self.alice, title='Docs', credits=30, is_completed=True)
+        Task.objects.create(member=self.bob, title='Tests', credits=20, is_completed=True)
+        url = reverse('members:api-trend-list')
+
+        self.assertEqual(self.client.get(url, {'period': 'week'}).json()[0]['credits_earned'], 50)
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'member': 'REG002'})
+        self.assertEqual(response.json(), [{
+            'start': timezone.localdate().isoformat(),
+            'credits_earned': 20, 'tasks_created': 1, 'tasks_completed': 1,
+        }])
+        self.assertEqual(self.client.get(url, {'period': 'month'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'member': 'REG404'}).status_code, 404)
+
+
+class TaskEventTests(TrackerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = Member.objects.create(name='Alice', reg_number='REG001', email='alice@example.com')
+        self.bob = Member.objects.create(name='Bob', reg_number='REG002', email='bob@example.com')
+
+    def test_changes_append_events_in_order(self):
+        task = Task.objects.create(member=self.alice, title='Docs', credits=30)
+        self.assertIsNone(task.completed_at)
+        task.is_completed = True
+        task.save()
+        self.assertIsNotNone(task.completed_at)
+        task.is_completed = False
+        task.credits = 40
+        task.member = self.bob
+        task.save()
+        self.assertIsNone(task.completed_at)
+        task_id = task.pk
+        task.delete()
+
+        events = list(TaskEvent.objects.since(0).values_list(
+            'kind', 'task_id', 'member_id', 'credits', 'previous_member_id', 'previous_credits'))
+        self.assertEqual(events, [
+            (TaskEvent.CREATED, task_id, self.alice.pk, 30, None, None),
+            (TaskEvent.COMPLETED, task_id, self.alice.pk, 30, None, None),
+            (TaskEvent.REASSIGNED, task_id, self.bob.pk, 40, self.alice.pk, None),
+            (TaskEvent.CREDITS_CHANGED, task_id, self.bob.pk, 40, None, 30),
+            (TaskEvent.REOPENED, task_id, self.bob.pk, 40, None, None),
+            (TaskEvent.DELETED, task_id, self.bob.pk, 40, None, None),
+        ])
+
+    def test_saving_without_changes_logs_nothing(self):
+        task = Task.objects.create(member=self.alice, title='Docs', credits=30, is_completed=True)
+        completed_at = task.completed_at
+        count = TaskEvent.objects.count()
+        task.title = 'Better docs'
+        task.save()
+        self.assertEqual(TaskEvent.objects.count(), count)
+        self.assertEqual(task.completed_at, completed_at)
+
+    def test_api_pages_by_seq(self):
+        for i in range(5):
+            Task.objects.create(member=self.alice, title=f'Task {i}', credits=10)
+        url = reverse('members:api-task-event-list')
+        self.client.force_login(get_user_model().objects.create_user('staff', is_staff=True))
+
+        # Plus the session and the user
+        with self.assertNumQueries(3):
+            page = self.client.get(url, {'limit': 3}).json()
+        self.assertEqual([event['kind'] for event in page['results']], [TaskEvent.CREATED] * 3)
+        self.assertTrue(page['has_more'])
+        page = self.client.get(url, {'since': page['last_seq'], 'limit': 3}).json()
+        self.assertEqual(len(page['results']), 2)
+        self.assertFalse(page['has_more'])
+        empty = self.client.get(url, {'since': page['last_seq']}).json()
+        self.assertEqual(empty, {'results': [], 'last_seq': page['last_seq'], 'has_more': False})
+        self.assertEqual(self.client.get(url, {'since': 'x'}).status_code, 400)
+
+
+class ApiTests(TrackerTestCase):
+    def setUp(self):
+        super().setUp()
+        for i, name in enumerate(['Alice', 'Bob', 'Carol'], start=1):
+            member = Member.objects.create(name=name, reg_number=f'REG00{i}', email=f'{name.lower()}@example.com')
+            for j in range(i):
+                Task.objects.create(member=member, title=f'{name} {j}', credits=10, is_completed=True)
+
+    def test_list_endpoints_use_constant_queries(self):
+        for name in ('api-member-list', 'api-task-list', 'api-leaderboard-list'):
+            with self.subTest(endpoint=name), self.assertNumQueries(1):
+                response = self.client.get(reverse(f'members:{name}'))
+                self.assertEqual(response.status_code, 200)
+
+    def test_sparse_fields_and_cursor_pagination(self):
+        response = self.client.get(reverse('members:api-leaderboard-list'), {'fields': 'rank,reg_number', 'page_size': 2})
+        data = response.json()
+        self.assertEqual(data['results'], [{'rank': 1, 'reg_number': 'REG003'}, {'rank': 2, 'reg_number': 'REG002'}])
+        rest = self.client.get(data['next']).json()
+        self.assertEqual([row['reg_number'] for row in rest['results']], ['REG001'])
+
+    def test_anonymous_clients_get_no_emails_or_event_log(self):
+        member = self.client.get(reverse('members:api-member-detail', args=['REG001'])).json()
+        self.assertNotIn('email', member)
+        self.assertEqual(self.client.get(reverse('members:api-task-event-list')).status_code, 403)
+        self.client.force_login(get_user_model().objects.create_user('viewer'))
+        self.assertEqual(self.client.get(reverse('members:api-task-event-list')).status_code, 403)
+
+    def test_member_stats(self):
+        response = self.client.get(reverse('members:api-member-stats', args=['REG002']))
+        self.assertEqual(response.json()['rank'], 2)
+        self.assertEqual(response.json()['total_credits'], 20)
+
+    def test_etag_returns_not_modified(self):
+        url = reverse('members:api-task-list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+
+
+class MetricsTests(TrackerTestCase):
+    def test_metrics_aggregate_flushed_counters(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'metrics.sqlite3')
+        with self.settings(METRICS_ENABLED=True, METRICS_DB=path, METRICS_FLUSH_INTERVAL=0):
+            self.client.get(reverse('members:dashboard'))
+            self.client.get(reverse('members:dashboard'))
+            body = self.client.get('/metrics').content.decode()
+
+        self.assertIn('falcon_http_requests_total{view="members:dashboard",method="GET",status="200"} 2', body)
+        self.assertIn('falcon_http_request_duration_seconds_count{view="members:dashboard"} 2', body)
+        self.assertIn('falcon_page_cache_hits_total 1', body)
+
+        buckets = [
+            line.split('le="')[1].split('"')[0] for line in body.splitlines()
+            if line.startswith('falcon_http_request_duration_seconds_bucket{view="members:dashboard"')
+        ]
+        self.assertEqual(buckets, [str(bucket) for bucket in metrics.DURATION_BUCKETS] + ['+Inf'])
@@ -1,11 +1,22 @@
-from django.urls import path
-from . import views
+from django.conf import settings
+from django.urls import include, path
+from . import api, views
 
 app_name = 'members'
 
+if settings.ASYNC_VIEWS:
+    pages = (views.adashboard, views.amember_list, views.aleaderboard, views.amember_detail, views.alive_events)
+else:
+    pages = (views.dashboard, views.member_list, views.leaderboard, views.member_detail, views.live_events)
+dashboard, member_list, leaderboard, member_detail, live_events = pages
+
 urlpatterns = [
-    path("", views.dashboard, name="dashboard"),
-    path("members/", views.member_list, name="member_list"),
-    path("leaderboard/", views.leaderboard, name="leaderboard"),
-    path("members/<str:reg_number>/", views.member_detail, name="member_detail"),
+    path("", dashboard, name="dashboard"),
+    path("members/", member_list, name="member_list"),
+    path("leaderboard/", leaderboard, name="leaderboard"),
+    path("members/<str:reg_number>/", member_detail, name="member_detail"),
+    path("events/", live_events, name="live_events"),
+    path("search/", views.search, name="search"),
+    path("export/<str:kind>/", views.export, name="export"),
+    path("api/", include(api.router.urls)),
 ]
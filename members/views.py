@@ -1,88 +1,294 @@
-from django.shortcuts import render, get_object_or_404
-from django.db.models import Sum, Count, Q
-from .models import Member, Task
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.paginator import Paginator
+from django.db import close_old_connections, connection
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.shortcuts import render, get_object_or_404, aget_object_or_404
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from . import cache, exports, live, metrics as tracker_metrics, search as tracker_search
+from .cache import cached_page
+from .models import LeaderboardEntry, Member, Task
+
+LEADERBOARD_PAGE_SIZE = 50
+TASKS_PAGE_SIZE = 100
+SEARCH_RESULTS = 20
+
+def _run_queries(queries):
+    return {name: query() for name, query in queries.items()}
+
+# Shared by every request in the process, so it holds at most
+# ASYNC_QUERY_THREADS connections of its own on top of the request threads'
+_query_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ASYNC_QUERY_THREADS', 4), thread_name_prefix='falcon-query',
+)
+
+def _on_own_connection(query):
+    """Wrap a query for an executor thread, which keeps a connection of its own"""
+    def run():
+        close_old_connections()
+        try:
+            return query()
+        finally:
+            close_old_connections()
+    return run
+
+def _queries_in_parallel():
+    """Only worth it when executor threads keep their connections between queries"""
+    if not getattr(settings, 'ASYNC_CONCURRENT_QUERIES', True):
+        return False
+    database = connection.settings_dict
+    return bool(database['CONN_MAX_AGE'] or database.get('OPTIONS', {}).get('pool'))
+
+async def _gather(queries):
+    """Async ``_run_queries``: run the independent queries concurrently.
+
+    They share the ``ASYNC_QUERY_THREADS`` executor threads. With
+    ``ASYNC_CONCURRENT_QUERIES`` off, or when every query would have to open
+    a fresh connection (``CONN_MAX_AGE=0`` without a pool), they run one after
+    another in a single thread hop, on the request's own connection.
+    """
+    if not _queries_in_parallel():
+        return await sync_to_async(_run_queries)(queries)
+    results = await asyncio.gather(*(
+        sync_to_async(_on_own_connection(query), thread_sensitive=False, executor=_query_executor)()
+        for query in queries.values()
+    ))
+    return dict(zip(queries, results))
+
+def _member_list_context(members):
+    return {
+        'members': members,
+        'total_members': len(members),
+        'top_performer': members[0] if members else None,
+    }
+
+@cached_page([cache.MEMBER_LIST])
 def member_list(request):
     """Display list of all members with their stats"""
-    members = Member.objects.annotate(
-        total_credits=Sum('tasks__credits', filter=Q(tasks__is_completed=True)),
-        total_tasks=Count('tasks'),
-        completed_tasks=Count('tasks', filter=Q(tasks__is_completed=True))
-    ).order_by('-total_credits')
-    
-    context = {
-        'members': members,
-        'total_members': members.count(),
-        'top_performer': members.first() if members else None,
+    members = list(Member.objects.order_by('-total_credits', 'name'))
+    return render(request, "members/member_list.html", _member_list_context(members))
+
+@cached_page([cache.MEMBER_LIST])
+async def amember_list(request):
+    members = [member async for member in Member.objects.order_by('-total_credits', 'name')]
+    return render(request, "members/member_list.html", _member_list_context(members))
+
+def _member_detail_page(request, member):
+    # member_id stays loaded: the related manager reads it to attach `member`
+    tasks = member.tasks.only(
+        'member', 'title', 'description', 'credits', 'is_completed', 'created_at', 'due_date'
+    ).order_by('-created_at', '-pk')
+    paginator = Paginator(tasks, TASKS_PAGE_SIZE)
+    # The stored counters already know the total, so skip the COUNT(*)
+    paginator.count = member.total_tasks
+    page = paginator.get_page(request.GET.get('page'))
+    return page, {
+        'tasks': lambda: list(page.object_list),
+        # The entry's credits are the member's, synced in the same transaction
+        'rank': lambda: LeaderboardEntry.objects.rank_for_credits(member.total_credits),
     }
-    return render(request, "members/member_list.html", context)
 
-def member_detail(request, reg_number):
-    """Display detailed view of a specific member"""
-    member = get_object_or_404(Member, reg_number=reg_number)
-    tasks = member.tasks.all()
-    completed_tasks = tasks.filter(is_completed=True)
-    pending_tasks = tasks.filter(is_completed=False)
-    
-    total_credits = sum(task.credits for task in completed_tasks)
-    
-    context = {
+def _member_detail_context(member, page, results):
+    page.object_list = results['tasks']
+    # One pass over the page splits it into the two columns the template shows
+    completed_tasks, pending_tasks = [], []
+    for task in page:
+        (completed_tasks if task.is_completed else pending_tasks).append(task)
+
+    return {
         'member': member,
-        'tasks': tasks,
+        'page': page,
         'completed_tasks': completed_tasks,
         'pending_tasks': pending_tasks,
-        'total_credits': total_credits,
-        'completion_rate': (completed_tasks.count() / tasks.count() * 100) if tasks.count() > 0 else 0,
+        'total_tasks': member.total_tasks,
+        'completed_count': member.completed_tasks,
+        'pending_count': member.total_tasks - member.completed_tasks,
+        'total_credits': member.total_credits,
+        'rank': results['rank'],
+        'completion_rate': (member.completed_tasks / member.total_tasks * 100) if member.total_tasks > 0 else 0,
+        'today': timezone.now(),
     }
+
+@cached_page(lambda request, reg_number: [cache.member_group(reg_number), cache.RANKING])
+def member_detail(request, reg_number):
+    """Display detailed view of a specific member"""
+    member = get_object_or_404(Member, reg_number=reg_number)
+    page, queries = _member_detail_page(request, member)
+    context = _member_detail_context(member, page, _run_queries(queries))
     return render(request, "members/member_detail.html", context)
 
-def leaderboard(request):
-    """Display leaderboard of members ranked by credits"""
-    members = Member.objects.annotate(
-        total_credits=Sum('tasks__credits', filter=Q(tasks__is_completed=True)),
-        total_tasks=Count('tasks'),
-        completed_tasks=Count('tasks', filter=Q(tasks__is_completed=True))
-    ).order_by('-total_credits')
-    
-    # Get top 3 performers
-    top_members = list(members[:3])
+@cached_page(lambda request, reg_number: [cache.member_group(reg_number), cache.RANKING])
+async def amember_detail(request, reg_number):
+    member = await aget_object_or_404(Member, reg_number=reg_number)
+    page, queries = _member_detail_page(request, member)
+    context = _member_detail_context(member, page, await _gather(queries))
+    return render(request, "members/member_detail.html", context)
+
+def _leaderboard_queries(cursor):
+    if cursor is None:
+        entries = LeaderboardEntry.objects.ranked()
+    else:
+        entries = LeaderboardEntry.objects.after(*cursor)
+    queries = {
+        'entries': lambda: LeaderboardEntry.objects.with_ranks(
+            entries[:LEADERBOARD_PAGE_SIZE + 1], first_page=cursor is None,
+        ),
+        'total_members': LeaderboardEntry.objects.count,
+        'live_since': live.latest_id,
+    }
+    if cursor is not None:
+        queries['top_members'] = lambda: LeaderboardEntry.objects.with_ranks(
+            LeaderboardEntry.objects.ranked()[:3], first_page=True,
+        )
+    return queries
+
+def _leaderboard_context(cursor, results):
+    entries = results['entries']
+    has_next = len(entries) > LEADERBOARD_PAGE_SIZE
+    entries = entries[:LEADERBOARD_PAGE_SIZE]
+
+    top_members = entries[:3] if cursor is None else results['top_members']
     first_place = top_members[0] if len(top_members) > 0 else None
     second_place = top_members[1] if len(top_members) > 1 else None
     third_place = top_members[2] if len(top_members) > 2 else None
-    
-    context = {
-        'members': members,
+
+    return {
+        'entries': entries,
+        'total_members': results['total_members'],
         'first_place': first_place,
         'second_place': second_place,
         'third_place': third_place,
+        'is_first_page': cursor is None,
+        'next_cursor': f"{entries[-1].credits}.{entries[-1].member_id}" if has_next else None,
+        'live_since': results['live_since'],
+        'live_events': settings.LIVE_EVENTS_ENABLED,
         'page_title': 'Leaderboard'
     }
+
+@cached_page([cache.LEADERBOARD])
+def leaderboard(request):
+    """Display leaderboard of members ranked by credits, one keyset page at a time"""
+    cursor = _parse_leaderboard_cursor(request.GET.get('after'))
+    context = _leaderboard_context(cursor, _run_queries(_leaderboard_queries(cursor)))
     return render(request, "members/leaderboard.html", context)
 
+@cached_page([cache.LEADERBOARD])
+async def aleaderboard(request):
+    cursor = _parse_leaderboard_cursor(request.GET.get('after'))
+    context = _leaderboard_context(cursor, await _gather(_leaderboard_queries(cursor)))
+    return render(request, "members/leaderboard.html", context)
+
+def _parse_leaderboard_cursor(value):
+    """Parse ``after`` as ``<credits>.<member_id>``, or ``<credits>`` for the entries below it"""
+    if not value:
+        return None
+    try:
+        parts = [int(part) for part in value.split('.', 1)]
+    except ValueError:
+        return None
+    return (parts[0], parts[1] if len(parts) > 1 else None)
+
+def _dashboard_headline():
+    """Member, task, completion and credit totals in one query over the stored counters"""
+    return Member.objects.aggregate(
+        total_members=Count('pk'),
+        total_tasks=Coalesce(Sum('total_tasks'), 0),
+        completed_tasks=Coalesce(Sum('completed_tasks'), 0),
+        total_credits=Coalesce(Sum('total_credits'), 0),
+    )
+
+def _dashboard_queries():
+    """The dashboard's independent queries, run in parallel by ``adashboard``"""
+    return {
+        'headline': _dashboard_headline,
+        'recent_members': lambda: list(Member.objects.order_by('-created_at')[:5]),
+        'recent_tasks': lambda: list(Task.objects.select_related('member').order_by('-created_at')[:5]),
+        'top_performers': lambda: list(Member.objects.order_by('-total_credits', 'name')[:5]),
+        # Cached pages embed it, so a task change has to invalidate them anyway
+        'live_since': live.latest_id,
+    }
+
+def _dashboard_context(results):
+    context = {**results.pop('headline'), **results}
+    total_tasks, completed_tasks = context['total_tasks'], context['completed_tasks']
+    context['completion_rate'] = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+    context['live_events'] = settings.LIVE_EVENTS_ENABLED
+    return context
+
+@cached_page([cache.DASHBOARD])
 def dashboard(request):
     """Display main dashboard with overview stats"""
-    total_members = Member.objects.count()
-    total_tasks = Task.objects.count()
-    completed_tasks = Task.objects.filter(is_completed=True).count()
-    total_credits = Task.objects.filter(is_completed=True).aggregate(
-        total=Sum('credits')
-    )['total'] or 0
-    
-    recent_members = Member.objects.order_by('-created_at')[:5]
-    recent_tasks = Task.objects.order_by('-created_at')[:10]
-    
-    top_performers = Member.objects.annotate(
-        total_credits=Sum('tasks__credits', filter=Q(tasks__is_completed=True))
-    ).order_by('-total_credits')[:5]
-    
-    context = {
-        'total_members': total_members,
-        'total_tasks': total_tasks,
-        'completed_tasks': completed_tasks,
-        'total_credits': total_credits,
-        'completion_rate': (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0,
-        'recent_members': recent_members,
-        'recent_tasks': recent_tasks,
-        'top_performers': top_performers,
-    }
+    context = _dashboard_context(_run_queries(_dashboard_queries()))
+    return render(request, "members/dashboard.html", context)
+
+@cached_page([cache.DASHBOARD])
+async def adashboard(request):
+    """Async dashboard for ASGI; its independent queries run concurrently"""
+    context = _dashboard_context(await _gather(_dashboard_queries()))
     return render(request, "members/dashboard.html", context)
+
+def _last_event_id(request):
+    """EventSource resends Last-Event-ID on reconnect; pages pass ?since= the first time"""
+    value = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _event_stream_response(content):
+    response = StreamingHttpResponse(content, content_type="text/event-stream")
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def live_events(request):
+    """Server-Sent Events feed of task completions, credit and rank changes"""
+    if not settings.LIVE_EVENTS_ENABLED:
+        return HttpResponse(status=204)
+    return _event_stream_response(live.stream(_last_event_id(request)))
+
+async def alive_events(request):
+    if not settings.LIVE_EVENTS_ENABLED:
+        return HttpResponse(status=204)
+    return _event_stream_response(live.astream(_last_event_id(request)))
+
+@staff_member_required
+def export(request, kind):
+    """Stream members, tasks or the leaderboard as CSV or NDJSON"""
+    fmt = request.GET.get('format', 'csv')
+    if kind not in exports.COLUMNS or fmt not in exports.FORMATS:
+        return HttpResponseBadRequest("Unknown export or format")
+    try:
+        filters = exports.parse_filters(
+            kind,
+            since=request.GET.get('since'),
+            until=request.GET.get('until'),
+            completed=request.GET.get('completed'),
+        )
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+
+    header, rows = exports.export_rows(kind, **filters)
+    response = StreamingHttpResponse(
+        exports.render_lines(fmt, header, rows),
+        content_type=exports.FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
+
+def search(request):
+    """Search members and tasks; every word matches as a prefix"""
+    query = request.GET.get('q', '').strip()
+    results = tracker_search.search(query, limit=SEARCH_RESULTS) if query else {'members': [], 'tasks': []}
+    return render(request, "members/search.html", {'query': query, **results})
+
+def metrics(request):
+    """Prometheus text exposition of request, database and cache metrics from all workers"""
+    return HttpResponse(tracker_metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -4,6 +4,9 @@
 
 echo "Starting Falcon Django Application..."
 
+# WAL and BEGIN IMMEDIATE for the shared SQLite file (see falcon/settings.py)
+export SQLITE_PROFILE="${SQLITE_PROFILE:-production}"
+
 # Activate virtual environment
 source .venv/bin/activate
 
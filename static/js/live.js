@@ -0,0 +1,121 @@
+// Live counters for the dashboard and leaderboard.
+//
+// Listens to the Server-Sent Events feed named by data-live-events and patches
+// only the elements that carry data-live-* attributes, instead of reloading
+// the page. EventSource reconnects on its own and resends the last event id,
+// so events published while disconnected are replayed. Pages only carry
+// data-live-events when the server can hold streams open (LIVE_EVENTS_ENABLED).
+(function () {
+    const root = document.querySelector('[data-live-events]');
+    if (!root || !window.EventSource) {
+        return;
+    }
+
+    const url = new URL(root.dataset.liveEvents, window.location.href);
+    if (root.dataset.liveSince) {
+        url.searchParams.set('since', root.dataset.liveSince);
+    }
+    const source = new EventSource(url);
+
+    function memberRows(reg) {
+        return document.querySelectorAll('[data-live-member="' + CSS.escape(reg) + '"]');
+    }
+
+    function setField(row, field, value) {
+        row.querySelectorAll('[data-live-field="' + field + '"]').forEach(function (el) {
+            el.textContent = value;
+        });
+    }
+
+    // The top three get a medal instead of a number, as in leaderboard.html
+    const MEDALS = {1: 'text-yellow-500', 2: 'text-gray-400', 3: 'text-yellow-600'};
+
+    function setRank(row, rank) {
+        row.querySelectorAll('[data-live-rank]').forEach(function (cell) {
+            let el;
+            if (MEDALS[rank]) {
+                el = document.createElement('i');
+                el.className = 'fas fa-medal text-lg mr-2 ' + MEDALS[rank];
+            } else {
+                el = document.createElement('span');
+                el.className = 'text-gray-500 font-lora font-medium mr-4';
+                el.textContent = rank;
+            }
+            cell.replaceChildren(el);
+        });
+    }
+
+    function addToTotal(name, delta) {
+        document.querySelectorAll('[data-live-total="' + name + '"]').forEach(function (el) {
+            el.textContent = Number(el.textContent) + delta;
+        });
+    }
+
+    function updateCompletionRate() {
+        const tasks = document.querySelector('[data-live-total="tasks"]');
+        const completed = document.querySelector('[data-live-total="completed"]');
+        if (!tasks || !completed) {
+            return;
+        }
+        const total = Number(tasks.textContent);
+        const rate = total ? Number(completed.textContent) / total * 100 : 0;
+        document.querySelectorAll('[data-live-rate="text"]').forEach(function (el) {
+            el.textContent = rate.toFixed(1);
+        });
+        document.querySelectorAll('[data-live-rate="bar"]').forEach(function (el) {
+            el.style.width = rate.toFixed(1) + '%';
+        });
+    }
+
+    function flash(row) {
+        row.classList.add('bg-green-50');
+        setTimeout(function () { row.classList.remove('bg-green-50'); }, 1500);
+    }
+
+    source.addEventListener('credits_changed', function (event) {
+        const data = JSON.parse(event.data);
+        addToTotal('tasks', data.delta.tasks);
+        addToTotal('completed', data.delta.completed);
+        addToTotal('credits', data.delta.credits);
+        updateCompletionRate();
+        memberRows(data.member).forEach(function (row) {
+            setField(row, 'credits', data.credits);
+            setField(row, 'total_tasks', data.total_tasks);
+            setField(row, 'completed_tasks', data.completed_tasks);
+        });
+    });
+
+    // Mirrors LeaderboardQuerySet.with_ranks: everyone whose credits lie in
+    // the range the member crossed moves one place the other way.
+    source.addEventListener('rank_changed', function (event) {
+        const data = JSON.parse(event.data);
+        const low = Math.min(data.credits, data.previous_credits);
+        const high = Math.max(data.credits, data.previous_credits);
+        const step = data.credits > data.previous_credits ? 1 : -1;
+        document.querySelectorAll('[data-live-member][data-rank]').forEach(function (row) {
+            let rank = Number(row.dataset.rank);
+            if (row.dataset.liveMember === data.member) {
+                rank = data.rank;
+                row.dataset.credits = data.credits;
+            } else {
+                const credits = Number(row.dataset.credits);
+                if (credits >= low && credits < high) {
+                    rank += step;
+                }
+            }
+            if (Number(row.dataset.rank) !== rank) {
+                row.dataset.rank = rank;
+                setRank(row, rank);
+            }
+        });
+        document.querySelectorAll('[data-live-rows]').forEach(function (body) {
+            Array.from(body.children)
+                .sort(function (a, b) { return Number(a.dataset.rank) - Number(b.dataset.rank); })
+                .forEach(function (row) { body.appendChild(row); });
+        });
+    });
+
+    source.addEventListener('task_completed', function (event) {
+        memberRows(JSON.parse(event.data).member).forEach(flash);
+    });
+})();